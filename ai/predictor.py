@@ -1,18 +1,150 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from pickle import load
+from typing import Literal
 
 from numpy import array
 from sklearn.ensemble import RandomForestClassifier
 
 from ai.analyser import analyse_sample
+from utils.constants import INFERENCE_BATCH_SIZE, INFERENCE_BATCH_WAIT
 
 model: RandomForestClassifier
 
 
-def load_model():
+def _read_model():
     global model
     with open("ai/models/model.ai", "rb") as f:
         model = load(f)
 
 
+def load_model():
+    _read_model()
+    if executor is not None:
+        executor.reload()
+
+
+def get_features(sample: str) -> tuple[int, int, int, int]:
+    return tuple(analyse_sample(sample)[:4])
+
+
 def is_spam(sample: str) -> bool:
-    return bool(model.predict(array(analyse_sample(sample)[:4], ndmin=2))[0])
+    return bool(model.predict(array(get_features(sample), ndmin=2))[0])
+
+
+def _predict(features: list[tuple[int, int, int, int]]) -> list[bool]:
+    # in a process pool this uses the copy of the model read by the worker initializer
+    return [bool(r) for r in model.predict(array(features, ndmin=2))]
+
+
+class InferenceExecutor:
+    """Runs the model off the event loop.
+
+    With the `thread` kind the workers share the model of this process. With the `process` kind every worker loads
+    its own copy of `model.ai`, so `reload` replaces the pool after the model file changes."""
+
+    kind: Literal["thread", "process"]
+    workers: int
+
+    def __init__(self, kind: Literal["thread", "process"] = "thread", workers: int = 1):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self._pool = self._create_pool()
+
+    def _create_pool(self) -> Executor:
+        if self.kind == "process":
+            return ProcessPoolExecutor(self.workers, initializer=_read_model)
+        return ThreadPoolExecutor(self.workers, thread_name_prefix="inference")
+
+    async def predict(self, features: list[tuple[int, int, int, int]]) -> list[bool]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, _predict, features)
+
+    def reload(self):
+        if self.kind == "process":
+            old, self._pool = self._pool, self._create_pool()
+            old.shutdown(wait=False)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+executor: InferenceExecutor | None = None
+
+
+def setup_executor(kind: Literal["thread", "process"], workers: int):
+    global executor
+    if executor is not None:
+        executor.shutdown()
+    executor = InferenceExecutor(kind, workers)
+
+
+def get_executor() -> InferenceExecutor:
+    global executor
+    if executor is None:
+        executor = InferenceExecutor()
+
+    return executor
+
+
+class InferenceBatcher:
+    """Collects the samples checked concurrently and evaluates them with a single `predict` call.
+
+    The overhead of a `predict` call is much bigger than the evaluation of a single sample, so the samples wait for
+    up to `max_wait` seconds or until `max_size` of them are collected and the whole matrix is evaluated at once.
+    The batches are run by the executor, the next one is collected meanwhile."""
+
+    max_size: int
+    max_wait: float
+
+    def __init__(self, max_size: int = INFERENCE_BATCH_SIZE, max_wait: float = INFERENCE_BATCH_WAIT):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._pending: list[tuple[tuple[int, int, int, int], asyncio.Future[bool]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._running: set[asyncio.Task] = set()
+
+    async def is_spam(self, sample: str) -> bool:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((get_features(sample), future))
+        if len(self._pending) >= self.max_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self.flush)
+
+        return await future
+
+    def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if len(pending) == 0:
+            return
+
+        task = asyncio.create_task(self._run(pending))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, pending: list[tuple[tuple[int, int, int, int], asyncio.Future[bool]]]):
+        try:
+            results = await get_executor().predict([features for features, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(pending, results):
+            if not future.done():  # the caller could have been cancelled meanwhile
+                future.set_result(result)
+
+
+batcher = InferenceBatcher()
+
+
+async def is_spam_async(sample: str) -> bool:
+    """Same as `is_spam` but does not block the event loop, the concurrent checks are batched together."""
+    return await batcher.is_spam(sample)
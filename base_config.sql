@@ -22,13 +22,13 @@ CREATE TABLE IF NOT EXISTS guilds
 
     blacklist_enabled              BOOLEAN       DEFAULT TRUE,
     blacklist_ignored              BIGINT[]      DEFAULT ARRAY []::BIGINT[],
-    blacklist_common               TEXT[]        DEFAULT ARRAY []::TEXT[] CHECK (ARRAY_LENGTH(blacklist_common, 1) <= 50),
-    blacklist_wild                 TEXT[]        DEFAULT ARRAY []::TEXT[] CHECK (ARRAY_LENGTH(blacklist_wild, 1) <= 50),
-    blacklist_super                TEXT[]        DEFAULT ARRAY []::TEXT[] CHECK (ARRAY_LENGTH(blacklist_super, 1) <= 50),
     blacklist_filter_enabled       BOOLEAN       DEFAULT TRUE,
+    blacklist_version              BIGINT        DEFAULT 0, -- taken from blacklist_versions on every words change
+    blacklist_template             TEXT,                    -- id of a template in res/templates/blacklist.json
 
     whitelist_enabled              BOOLEAN       DEFAULT FALSE,
     whitelist_characters           VARCHAR(1024) DEFAULT 'abcdefghijklmnopqrstuvwxyz!@#$%^&*(){}[]<>-_=+?~`:;''"/\|<>.,1234567890',
+    whitelist_ranges               TEXT[]        DEFAULT ARRAY []::TEXT[],
     whitelist_ignored              BIGINT[]      DEFAULT ARRAY []::BIGINT[],
 
     nickfilter_enabled             BOOLEAN       DEFAULT TRUE,
@@ -56,9 +56,20 @@ CREATE TABLE IF NOT EXISTS version_data
 );
 
 INSERT INTO version_data (id, version)
-VALUES (0, 10)
+VALUES (0, 15)
 ON CONFLICT DO NOTHING;
 
+CREATE SEQUENCE IF NOT EXISTS blacklist_versions;
+
+CREATE TABLE IF NOT EXISTS blacklist_words
+(
+    id       BIGSERIAL PRIMARY KEY, -- keeps the order the words were added in
+    guild_id BIGINT NOT NULL,
+    mode     TEXT   NOT NULL, -- decodification in utils.enums.BlacklistMode
+    word     TEXT   NOT NULL,
+    UNIQUE (guild_id, mode, word)
+);
+
 CREATE TABLE IF NOT EXISTS rules
 (
     id        BIGINT NOT NULL,
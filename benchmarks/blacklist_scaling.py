@@ -0,0 +1,68 @@
+"""Per-message blacklist matching cost for growing words lists.
+
+Compares the compiled matcher with the substring search per word it replaced.
+Run from the repository root: `python -m benchmarks.blacklist_scaling`"""
+import random
+import string
+import time
+from types import SimpleNamespace
+
+from utils.filters.blacklist import _format_expression, compile_blacklist, is_blacklisted
+
+SIZES = (50, 500, 5000)
+MESSAGES = 2000
+REPEATS = 3
+
+
+def random_word(rng: random.Random) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10)))
+
+
+def random_message(rng: random.Random) -> str:
+    return " ".join(random_word(rng) for _ in range(rng.randint(5, 40)))
+
+
+def naive_is_blacklisted(bl, expr: str) -> bool:
+    expr = _format_expression(expr)
+    if set(bl.common) & set(expr.split(" ")):
+        return True
+    if any(word in expr for word in bl.wild):
+        return True
+
+    expr = expr.replace(" ", "")
+    return any(word in expr for word in bl.super)
+
+
+def measure(func, bl, messages: list[str]) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        for message in messages:
+            func(bl, message)
+        best = min(best, time.perf_counter() - started)
+
+    return best / len(messages) * 1_000_000
+
+
+def main():
+    rng = random.Random(0)
+    messages = [random_message(rng) for _ in range(MESSAGES)]
+    print(f"{'WORDS PER MODE':>15}{'COMPILE MS':>12}{'COMPILED US/MSG':>17}{'NAIVE US/MSG':>14}")
+    for version, size in enumerate(SIZES, 1):
+        bl = SimpleNamespace(
+            common=[random_word(rng) for _ in range(size)],
+            wild=[random_word(rng) for _ in range(size)],
+            super=[random_word(rng) for _ in range(size)],
+            filter_enabled=False,
+            version=version,
+        )
+        started = time.perf_counter()
+        compile_blacklist(bl)
+        compile_ms = (time.perf_counter() - started) * 1000
+        compiled_us = measure(lambda b, m: is_blacklisted(b, m)[0], bl, messages)
+        naive_us = measure(naive_is_blacklisted, bl, messages)
+        print(f"{size:>15}{compile_ms:>12.1f}{compiled_us:>17.1f}{naive_us:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Per-character normalization cost for different scripts and message lengths.
+
+The folding table is a plain `str.translate` mapping, so the cost per character should not depend on the
+length of the message nor on how many characters are folded.
+Run from the repository root: `python -m benchmarks.normalizer`"""
+import random
+import time
+
+from utils.filters.blacklist import TRANSLATION_TABLE, _format_expression
+
+LENGTHS = (100, 1000, 10000)
+REPEATS = 200
+ALPHABETS = {
+    "ascii": "abcdefghijklmnopqrstuvwxyz      0123456789!?.,",
+    "cyrillic": "абвгдеёжзийклмнопрстуфхцчшщъыьэюя      ",
+    "fullwidth": "ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚ      ",
+    "math bold": "𝐚𝐛𝐜𝐝𝐞𝐟𝐠𝐡𝐢𝐣𝐤𝐥𝐦𝐧𝐨𝐩𝐪𝐫𝐬𝐭𝐮𝐯𝐰𝐱𝐲𝐳      ",
+    "mixed": "abcdefghijklmnopqrstuvwxyz абвгдежзий ａｂｃ 𝐚𝐛𝐜 fúçk ⓐⓑⓒ",
+}
+
+
+def measure(text: str) -> float:
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            _format_expression(text)
+        best = min(best, time.perf_counter() - started)
+
+    return best / REPEATS / len(text) * 1_000_000_000
+
+
+def main():
+    rng = random.Random(0)
+    print(f"translation table: {len(TRANSLATION_TABLE)} entries")
+    print(f"{'ALPHABET':<12}" + "".join(f"{f'NS/CHAR @{n}':>16}" for n in LENGTHS))
+    for name, alphabet in ALPHABETS.items():
+        row = f"{name:<12}"
+        for length in LENGTHS:
+            row += f"{measure(''.join(rng.choices(alphabet, k=length))):>16.1f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Spam inference throughput of a `predict` call per message compared with the micro-batched path.
+
+The model is trained on random features with the same parameters as `ai/train.py`, only the call overhead matters.
+Run from the repository root: `python -m benchmarks.spam_inference`"""
+import asyncio
+import random
+import string
+import time
+
+from numpy import array
+from sklearn.ensemble import RandomForestClassifier
+
+from ai import predictor
+
+MESSAGES = 2000
+CONCURRENCY = (1, 8, 64, 256)
+
+
+def random_message(rng: random.Random) -> str:
+    return " ".join("".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 10))) for _ in range(rng.randint(1, 30)))
+
+
+def train_model(rng: random.Random) -> RandomForestClassifier:
+    features = array([predictor.get_features(random_message(rng)) for _ in range(2000)])
+    labels = array([rng.random() < 0.3 for _ in range(len(features))])
+    return RandomForestClassifier().fit(features, labels)
+
+
+def measure_sequential(messages: list[str]) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        predictor.is_spam(message)
+
+    return len(messages) / (time.perf_counter() - started)
+
+
+async def measure_batched(messages: list[str], concurrency: int) -> float:
+    """`concurrency` workers check the messages at the same time, like the events of different guilds would."""
+    batcher = predictor.InferenceBatcher()
+    it = iter(messages)
+
+    async def worker():
+        for message in it:
+            await batcher.is_spam(message)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return len(messages) / (time.perf_counter() - started)
+
+
+def main():
+    rng = random.Random(0)
+    predictor.model = train_model(rng)
+    messages = [random_message(rng) for _ in range(MESSAGES)]
+    print(f"batch size {predictor.INFERENCE_BATCH_SIZE}, wait window {predictor.INFERENCE_BATCH_WAIT * 1000:.1f}ms")
+    print(f"{'CONCURRENCY':>12}{'SEQUENTIAL MSG/S':>18}{'BATCHED MSG/S':>15}")
+    sequential = measure_sequential(messages[:200])
+    for concurrency in CONCURRENCY:
+        batched = asyncio.run(measure_batched(messages, concurrency))
+        print(f"{concurrency:>12}{sequential:>18.0f}{batched:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,12 @@ import disnake
 from disnake.ext import commands, tasks
 
 from utils.bot import Bot
+from utils.datamodels import GuildSnapshot
 from utils.embeds import WarningEmbed
 from utils.enums import FetchMode, Stat
-from utils.filters.blacklist import is_blacklisted
-from utils.nicknames import generate_random_nick
 from utils.processors.antiraid import AntiraidProcessor
 from utils.processors.messages import AntiSpamProcessor, BlacklistProcessor, WhitelistProcessor
-from utils.utils import try_send
+from utils.processors.nicknames import NickfilterProcessor
 
 
 class Automod(commands.Cog):
@@ -20,6 +19,7 @@ class Automod(commands.Cog):
         self.blacklist_processor = BlacklistProcessor(bot)
         self.whitelist_processor = WhitelistProcessor(bot)
         self.antiraid_processor = AntiraidProcessor(bot)
+        self.nickfilter_processor = NickfilterProcessor(bot)
         self.permission_warnings: dict[int, datetime] = {}
         # structure {guild_id: {member1_id: Queue[Message], member2_id: Queue[Message]}}
 
@@ -56,30 +56,33 @@ class Automod(commands.Cog):
         ):
             return
 
-        await self._process_message(message)
+        await self.bot.warmed_up.wait()
+        snapshot = await self.bot.db.get_guild(message.guild.id).get_snapshot()
+        await self._process_message(message, snapshot)
         await self.bot.db.register_stat_increase(Stat.MESSAGES_PROCESSED)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: disnake.Member, after: disnake.Member):
         if before.nick != after.nick:
-            await self._process_nickfilter(after)
+            await self.nickfilter_processor.process(after, await self.bot.db.get_guild(after.guild.id).get_snapshot())
 
     @commands.Cog.listener()
     async def on_member_join(self, member: disnake.Member):
-        await self._process_nickfilter(member)
-        amount = await self.antiraid_processor.process(member)
+        snapshot = await self.bot.db.get_guild(member.guild.id).get_snapshot()
+        await self.nickfilter_processor.process(member, snapshot)
+        amount = await self.antiraid_processor.process(member, snapshot)
         if amount > 0:
             await self.bot.db.register_stat_increase(Stat.RAIDERS_PUNISHED)
 
-    async def _process_message(self, message: disnake.Message):
+    async def _process_message(self, message: disnake.Message, snapshot: GuildSnapshot):
         try:
-            if await self.whitelist_processor.process(message):
+            if await self.whitelist_processor.process(message, snapshot):
                 await self.bot.db.register_stat_increase(Stat.BAD_CHARACTERS_BLOCKED)
 
-            elif await self.antispam_processor.process(message):
+            elif await self.antispam_processor.process(message, snapshot):
                 await self.bot.db.register_stat_increase(Stat.SPAM_BLOCKED)
 
-            elif await self.blacklist_processor.process(message):
+            elif await self.blacklist_processor.process(message, snapshot):
                 await self.bot.db.register_stat_increase(Stat.BAD_WORDS_BLOCKED)
 
         except disnake.Forbidden:
@@ -111,34 +114,6 @@ Please grant the required permission to the bot.",
         except Exception as e:
             raise e
 
-    async def _process_nickfilter(self, member: disnake.Member):
-        guild_data = self.bot.db.get_guild(member.guild.id)
-        enabled, ignored = await guild_data.get_nickfilter_data()
-        if not enabled or any(r.id in ignored for r in member.roles):
-            return
-
-        bl = await guild_data.get_blacklist_data()
-        old_nick = member.display_name
-        if is_blacklisted(bl, old_nick)[0]:
-            nick = generate_random_nick()
-            try:
-                await member.edit(nick=nick)
-            except disnake.Forbidden:
-                self.bot.log.warning(
-                    "Failed to change nickname of user %s in guild %s",
-                    member,
-                    member.guild,
-                )
-                return
-            await try_send(
-                member,
-                f"Your current name on **{member.guild.name}** does not pass its blacklist filter, \
-so you were given randomly generated **{nick}** nickname.",
-            )
-            log = await guild_data.get_logger(self.bot)
-            await log.log_nick_change(member, old_nick, nick)
-            await self.bot.db.register_stat_increase(Stat.NICKNAMES_FILTERED)
-
 
 def setup(bot: Bot):
     bot.auto_setup(__name__)
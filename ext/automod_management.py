@@ -4,20 +4,35 @@ import typing
 import disnake
 from disnake.ext import commands
 
+from utils.autocomplete import autocomplete_script_presets, autocomplete_whitelist_ranges
 from utils.bot import Bot
 from utils.checks import is_automod_manager
 from utils.embeds import BaseEmbed, ErrorEmbed, SuccessEmbed, WarningEmbed
 from utils.enums import AntiraidPunishment, BlacklistMode, ViewResponse
-from utils.filters.blacklist import preformat
+from utils.filters.blacklist import load_templates, preformat
+from utils.filters.whitelist import parse_range
+from utils.processors.nicknames import NickfilterProcessor, SweepProgress
 from utils.utils import delete_and_preserve
 from utils.views import BaseView, Button, ConfirmationView
 
 
+def _format_words(words: typing.Sequence[str], limit: int = 1024) -> str:
+    """Joins the words for an embed field, the ones that do not fit are only counted."""
+    text = ""
+    for i, word in enumerate(words):
+        part = f"`{word}`" if i == 0 else f", `{word}`"
+        rest = f" and **{len(words) - i}** more"
+        if len(text) + len(part) + len(rest) > limit:
+            return text + rest
+
+        text += part
+
+    return text or "``"
+
+
 class BlacklistManagement(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
-        with open("res/templates/blacklist.json", "r") as f:
-            self.templates: dict[str, list[str]] = json.load(f)
 
     async def cog_slash_command_check(self, inter: disnake.ApplicationCommandInteraction) -> bool:
         return await is_automod_manager(self.bot, inter)
@@ -69,22 +84,34 @@ Example: blacklisted - `frick`; expression: `fricking`\n\n\
 **SUPER** - works just like the **WILD** but ignores spaces. \
 This can also detect words *across several messages*. Example: blacklisted - `frick`; expression - `fr icki ng`",
         )
-        embed.add_field("Common", "`" + "`, `".join(bl.common) + "`")
-        embed.add_field("Wild", "`" + "`, `".join(bl.wild) + "`")
-        embed.add_field("Super", "`" + "`, `".join(bl.super) + "`")
+        if bl.template is not None:
+            embed.add_field("Template", f"`{bl.template}`", inline=False)
+        embed.add_field("Common", _format_words(bl.common))
+        embed.add_field("Wild", _format_words(bl.wild))
+        embed.add_field("Super", _format_words(bl.super))
         await inter.send(embed=embed, ephemeral=hidden)
 
     @blacklist_group.sub_command(
         name="templates",
-        description="Load the word blacklist from the standart template. This preserves already existing words.",
+        description="Use a prepared template along with the own blacklisted words. This preserves existing words.",
     )
-    async def blacklist_template(self, inter: disnake.ApplicationCommandInteraction):
-        await inter.response.defer()
-        guild_data = self.bot.db.get_guild(inter.guild.id)
-        for mode in BlacklistMode:
-            await guild_data.addmany_blacklist_words(self.templates[mode.value], mode)
+    async def blacklist_template(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        template: str = commands.Param("standard", choices=list(load_templates())),
+    ):
+        await self.bot.db.get_guild(inter.guild.id).set_blacklist_template(template)
+        await inter.send(embed=SuccessEmbed(inter, f"Successfully loaded `{template}` blacklist template."))
 
-        await inter.send(embed=SuccessEmbed(inter, "Successfully loaded blacklist from template."))
+    @blacklist_group.sub_command(
+        name="detach",
+        description="Copies the words of the used template into the own words, so that they can be edited.",
+    )
+    async def blacklist_detach(self, inter: disnake.ApplicationCommandInteraction):
+        template = await self.bot.db.get_guild(inter.guild.id).detach_blacklist_template()
+        await inter.send(
+            embed=SuccessEmbed(inter, f"Successfully copied the words of `{template}` template into the own words.")
+        )
 
     @blacklist_group.sub_command(name="add", description="Adds a new blacklisted expression.")
     async def blacklist_add(
@@ -157,8 +184,13 @@ This can also detect words *across several messages*. Example: blacklisted - `fr
         )
         res, inter = await view.get_result()
         if res == ViewResponse.YES:
-            await self.bot.db.get_guild(inter.guild.id).clear_blacklist(mode)
-            await inter.send(embed=SuccessEmbed(inter, "Successfully cleared the requested blacklist."))
+            guild_data = self.bot.db.get_guild(inter.guild.id)
+            await guild_data.clear_blacklist(mode)
+            text = "Successfully cleared the requested blacklist."
+            template = (await guild_data.get_snapshot()).blacklist.template
+            if mode is not None and template is not None:
+                text += f"\nThe words of `{template}` template are still checked, use `/blacklist detach` to edit them."
+            await inter.send(embed=SuccessEmbed(inter, text))
         else:
             await inter.send("Operation cancelled.", delete_after=3)
 
@@ -286,6 +318,7 @@ class WhitelistManagement(commands.Cog):
                 f"You are going to change the whitelisted characters.\n\
 The whitelist is currently **{'enabled' if data.enabled else 'disabled'}**\n\
 Current whitelisted characters: ```{data.characters}```\n\
+Whitelisted ranges (not affected): {_format_words(data.ranges, 256)}\n\
 **WARNING**\nAdding new set of characters will overwrite the existing ones. \
 Please do not add uppercase symbols because all the messages are converted to lowercase.\n\n\
 __**Are you sure you want to overwrite the existing characters with the new ones?**__\n\
@@ -356,6 +389,45 @@ __**Are you sure you want to overwrite the existing characters with the new ones
         removed = await self.bot.db.get_guild(inter.guild.id).add_whitelist_characters(characters)
         await inter.send(f"Successfully removed **{removed}** characters.")
 
+    @whitelist_group.sub_command(
+        name="addrange",
+        description="Allows a whole script or a range of characters, e.g. cyrillic, U+0400-U+04FF or а-я.",
+    )
+    async def whitelist_addrange(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        entry: str = commands.Param(
+            description="A script name, a range of codepoints or of characters.",
+            autocomplete=autocomplete_script_presets,
+        ),
+    ):
+        value = parse_range(entry)
+        if value is None:
+            await inter.send(
+                embed=ErrorEmbed(
+                    inter,
+                    f"`{entry}` is neither a known script nor a valid range. \
+Use a range of codepoints like `U+0400-U+04FF` or of characters like `а-я`.",
+                ),
+                ephemeral=True,
+            )
+            return
+
+        await self.bot.db.get_guild(inter.guild.id).add_whitelist_range(value)
+        await inter.send(embed=SuccessEmbed(inter, f"Successfully whitelisted `{value}`."))
+
+    @whitelist_group.sub_command(name="removerange", description="Removes a script or a range from the whitelist.")
+    async def whitelist_removerange(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        entry: str = commands.Param(
+            description="A whitelisted script or range.",
+            autocomplete=autocomplete_whitelist_ranges,
+        ),
+    ):
+        await self.bot.db.get_guild(inter.guild.id).remove_whitelist_range(parse_range(entry) or entry)
+        await inter.send(embed=SuccessEmbed(inter, f"Successfully removed `{entry}` from the whitelist."))
+
     @whitelist_group.sub_command_group(name="ignore")
     async def whitelist_ignore(self, *_):
         pass
@@ -393,6 +465,7 @@ __**Are you sure you want to overwrite the existing characters with the new ones
 class NickfilterManagement(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot = bot
+        self.processor = NickfilterProcessor(bot)
 
     async def cog_slash_command_check(self, inter: disnake.ApplicationCommandInteraction) -> bool:
         return await is_automod_manager(self.bot, inter)
@@ -428,6 +501,56 @@ class NickfilterManagement(commands.Cog):
         await self.bot.db.get_guild(inter.guild.id).remove_nickfilter_ignored(role.id)
         await inter.send(embed=SuccessEmbed(inter, f"Removed {role.mention} from the NickFilter ignored roles."))
 
+    @nickfilter_group.sub_command(
+        name="sweep",
+        description="Checks the names of all the members and renames the ones that do not pass the blacklist.",
+    )
+    async def nickfilter_sweep(self, inter: disnake.ApplicationCommandInteraction):
+        snapshot = await self.bot.db.get_guild(inter.guild.id).get_snapshot()
+        enabled, _ = snapshot.nickfilter
+        if not enabled:
+            await inter.send(embed=ErrorEmbed(inter, "NickFilter is disabled in this guild."), ephemeral=True)
+            return
+        if inter.guild.id in self.processor.sweeping:
+            await inter.send(embed=ErrorEmbed(inter, "A sweep is already running in this guild."), ephemeral=True)
+            return
+
+        self.processor.sweeping.add(inter.guild.id)
+        try:
+            await inter.response.defer(ephemeral=True)
+            reporting = True
+
+            async def report(progress: SweepProgress):
+                nonlocal reporting
+                if not reporting:
+                    return
+                try:
+                    await inter.edit_original_message(
+                        embed=BaseEmbed(
+                            inter,
+                            "NickFilter Sweep",
+                            f"**CHECKED:** `{progress.checked}/{progress.total}`\n\
+**FLAGGED:** `{progress.flagged}`\n\
+**RENAMED:** `{progress.renamed}`, `{progress.failed}` failed",
+                        )
+                    )
+                except disnake.HTTPException:
+                    reporting = False  # the interaction token expires in 15 minutes, the sweep goes on anyway
+
+            progress = await self.processor.sweep(inter.guild, snapshot, report)
+        finally:
+            self.processor.sweeping.discard(inter.guild.id)
+
+        if reporting:
+            await inter.edit_original_message(
+                embed=SuccessEmbed(
+                    inter,
+                    f"Sweep finished! Checked **{progress.checked}** members, renamed **{progress.renamed}** \
+of **{progress.flagged}** blacklisted names.",
+                    disable_bold=True,
+                )
+            )
+
 
 class Automation(commands.Cog):
     def __init__(self, bot: Bot):
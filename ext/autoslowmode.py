@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from typing import Any
 
 import disnake
 from disnake.ext import commands
@@ -18,6 +19,15 @@ class Autoslowmode(commands.Cog):
         self._slowmode_cooldowns: dict[int, datetime] = {}
 
         self.asm_data: dict[int, Queue[disnake.Message]] = {}
+        self.bot.db.bus.subscribe("autoslowmode", self._on_autoslowmode_invalidation)
+
+    def _on_autoslowmode_invalidation(self, payload: dict[str, Any]):
+        if "channel_id" not in payload:
+            self._cache_loaded = False
+        elif payload["added"]:
+            self.cached_autoslowmode_channels.add(payload["channel_id"])
+        else:
+            self.cached_autoslowmode_channels.discard(payload["channel_id"])
 
     async def cog_slash_command_check(self, inter: disnake.ApplicationCommandInteraction) -> bool:
         return await is_automod_manager(self.bot, inter)
@@ -1,13 +1,16 @@
 import os
 import platform
+from datetime import timedelta
 
 import disnake
 import psutil
 from disnake.ext import commands
 
 from utils.bot import Bot
+from utils.constants import TRAIN_GUILD_IDS
 from utils.embeds import BaseEmbed, ErrorEmbed, SuccessEmbed
 from utils.enums import FetchMode
+from utils.filters.blacklist import normalization_cache
 from utils.nicknames import generate_random_nick
 
 
@@ -45,6 +48,55 @@ class Miscellaneous(commands.Cog):
 
         await inter.send(embed=embed)
 
+    @commands.slash_command(
+        name="dbstats",
+        description="Show database pool and query latency stats. **Owner only**.",
+        guild_ids=TRAIN_GUILD_IDS,
+    )
+    @commands.is_owner()
+    async def dbstats(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        reset: bool = commands.Param(False, description="Whether to reset the collected stats afterwards."),
+    ):
+        metrics = self.bot.db.get_metrics()
+        acquire = metrics["acquire"]
+        cache = normalization_cache.stats()
+        text = f"{'QUERY':<32}{'COUNT':>8}{'AVG MS':>8}{'P95 MS':>8}{'ERR':>5}\n"
+        for name, q in metrics["queries"].items():
+            line = f"{name[:31]:<32}{q['count']:>8}{q['avg'] * 1000:>8.2f}{q['p95'] * 1000:>8.1f}{q['errors']:>5}\n"
+            if len(text) + len(line) > 1000:
+                break
+            text += line
+
+        embed = (
+            BaseEmbed(
+                inter,
+                "Database Stats",
+                f"Collected over the last `{timedelta(seconds=int(metrics['uptime']))}`.",
+            )
+            .add_field(
+                "Pool",
+                f"**SIZE:** `{metrics['pool_size']}/{metrics['pool_max_size']}`, `{metrics['pool_idle']}` idle\n\
+**IN FLIGHT:** `{metrics['in_flight']}` now, `{metrics['max_in_flight']}` max\n\
+**ACQUIRE WAIT:** `{acquire['avg'] * 1000:.2f}ms` avg, `{acquire['p95'] * 1000:.1f}ms` p95, \
+`{acquire['max'] * 1000:.1f}ms` max",
+                inline=False,
+            )
+            .add_field("Queries (by total time)", f"```{text}```", inline=False)
+            .add_field(
+                "Normalization Cache",
+                f"**SIZE:** `{cache['size']}/{cache['max_size']}`\n\
+**HIT RATE:** `{cache['hit_rate']:.1%}` (`{cache['hits']}` hits, `{cache['misses']}` misses)",
+                inline=False,
+            )
+        )
+        if reset:
+            self.bot.db.metrics.reset()
+            normalization_cache.reset_stats()
+
+        await inter.send(embed=embed, ephemeral=True)
+
     @commands.message_command(name="Purge All Below")
     @commands.has_permissions(manage_messages=True)
     async def purge_all_below(self, inter: disnake.MessageCommandInteraction, message: disnake.Message):
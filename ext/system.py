@@ -53,6 +53,9 @@ class SystemListeners(commands.Cog):
             guild.id,
             guild.description,
         )
+        self.bot.db.known_guilds.add(guild.id)
+        self.bot.db.invalidate_guild(guild.id)
+        await self.bot.db.bus.publish("guild", guild_id=guild.id)
         await self.bot.log_channel.send(
             embed=BaseEmbed(
                 self.bot.owner,
@@ -115,6 +118,8 @@ Once again, thanks for inviting AIAS! We hope it will help you improve moderatio
                 after.description,
                 after.id,
             )
+            self.bot.db.invalidate_guild(after.id)
+            await self.bot.db.bus.publish("guild", guild_id=after.id)
 
 
 class SystemLoops(commands.Cog):
@@ -227,6 +232,9 @@ asyncio.run_coroutine_threadsafe(asyncf(), asyncio.get_running_loop())"""
     ):
         fetch_mode = FetchMode(fetch_mode)
         r = await self.bot.db.execute(query, fetch_mode=fetch_mode)
+        # the query may have modified guilds bypassing the settings cache
+        self.bot.db.clear_guilds_cache()
+        await self.bot.db.bus.publish("guild")
         if fetch_mode == FetchMode.NONE or r is None:
             await inter.send("Query was executed successfully with no return.")
 
@@ -247,8 +255,8 @@ asyncio.run_coroutine_threadsafe(asyncf(), asyncio.get_running_loop())"""
     @commands.is_owner()
     async def retrain(self, inter: disnake.ApplicationCommandInteraction):
         await inter.response.defer()
-        predictor.load_model()
         await train_ai(self.bot.db)
+        predictor.load_model()  # also reloads the copies held by the inference workers
         await inter.send("Model was retrained successfully!")
 
 
@@ -1,7 +1,7 @@
 import disnake
 from disnake.ext import commands
 
-from ai.predictor import is_spam
+from ai.predictor import is_spam_async
 from utils.bot import Bot
 from utils.constants import TRAIN_GUILD_IDS
 from utils.embeds import SuccessEmbed
@@ -34,7 +34,7 @@ class Training(commands.Cog):
                 await inter.send(
                     embed=disnake.Embed(title="Is this message a spam?", description=f"{content[:1000]}").add_field(
                         "AI Prediction",
-                        "YES" if is_spam(content) else "NO",
+                        "YES" if await is_spam_async(content) else "NO",
                         inline=False,
                     ),
                     view=view,
@@ -0,0 +1,5 @@
+import os
+
+# utils.env validates the variables on import, the tests never connect anywhere
+for name in ("TOKEN", "TOPGG_TOKEN", "DATABASE", "USER"):
+    os.environ.setdefault(name, "test")
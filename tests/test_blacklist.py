@@ -0,0 +1,112 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from utils.filters.automaton import Automaton
+from utils.filters.blacklist import BlacklistStream, is_blacklisted
+
+WORDS = ("a", "aa", "aab", "ab", "bab", "bb", "b c")
+
+
+def naive_spans(words, text: str) -> list[tuple[int, int]]:
+    return sorted((i, i + len(word)) for word in words for i in range(len(text) - len(word) + 1) if text.startswith(word, i))
+
+
+def random_texts(alphabet: str, amount: int = 300, max_length: int = 30) -> list[str]:
+    rng = random.Random(0)
+    return ["".join(rng.choices(alphabet, k=rng.randint(0, max_length))) for _ in range(amount)]
+
+
+@pytest.mark.parametrize("text", random_texts("abc "))
+def test_scan_finds_all_overlapping_matches(text: str):
+    automaton = Automaton(WORDS)
+    spans, _ = automaton.scan(text)
+    assert sorted(spans) == naive_spans(WORDS, text)
+    assert automaton.search(text) == (len(spans) > 0)
+
+
+@pytest.mark.parametrize("text", random_texts("abc ", amount=100))
+def test_resumed_scan_equals_scan_of_concatenation(text: str):
+    automaton = Automaton(WORDS)
+    expected, _ = automaton.scan(text)
+    for split in range(len(text) + 1):
+        head, state = automaton.scan(text[:split])
+        tail, _ = automaton.scan(text[split:], state)
+        assert head + [(start + split, end + split) for start, end in tail] == expected
+
+
+# the verdicts of the substring search the compiled matcher replaced
+BASELINE_MASK = {"!": "i", "1": "i", "0": "o", "$": "s", "3": "e", "@": "a"}
+
+
+def baseline_is_blacklisted(bl, expr: str) -> bool:
+    expr = "".join(BASELINE_MASK.get(c, c) for c in expr.strip().lower())
+    if set(bl.common) & set(expr.split(" ")):
+        return True
+    if any(word in expr for word in bl.wild):
+        return True
+
+    expr = expr.replace(" ", "")
+    return any(word in expr for word in bl.super)
+
+
+@pytest.mark.parametrize("filter_enabled", [False, True])
+def test_is_blacklisted_matches_baseline(filter_enabled: bool):
+    bl = SimpleNamespace(
+        common=("bad", "ass"),
+        wild=("frick", "heck"),
+        super=("darn", "shoot"),
+        filter_enabled=filter_enabled,
+    )
+    # fragments of the words joined at random, so that the words are often formed across the spaces and masks
+    fragments = ("ba", "d", "a", "$s", "s", "fri", "ck", "he", "c", "k", "da", "rn", "sh", "00", "o", "t", "!", "1ng")
+    rng = random.Random(0)
+    texts = [
+        "".join(rng.choice(fragments) + rng.choice(("", "", " ")) for _ in range(rng.randint(1, 12))) for _ in range(3000)
+    ] + [
+        "you are bad",
+        "badge",
+        "fricking",
+        "h e c k",
+        "d a r n it",
+        "$h00t",
+        "cl@ss",
+        "nothing here",
+    ]
+    for text in texts:
+        assert is_blacklisted(bl, text)[0] == baseline_is_blacklisted(bl, text), text
+
+
+def stream_blacklist(**words) -> SimpleNamespace:
+    return SimpleNamespace(
+        common=words.get("common", ()),
+        wild=words.get("wild", ()),
+        super=words.get("super", ()),
+        filter_enabled=False,
+    )
+
+
+def test_stream_finds_words_split_between_messages():
+    bl = stream_blacklist(wild=("heck",), super=("frick",))
+    stream = BlacklistStream()
+    assert not stream.feed(bl, "what the fr")
+    assert stream.feed(bl, "ick")
+
+    stream = BlacklistStream()
+    assert not stream.feed(bl, "oh")
+    assert stream.feed(bl, "heck")
+
+
+def test_stream_reset_forgets_previous_messages():
+    bl = stream_blacklist(super=("frick",))
+    stream = BlacklistStream()
+    assert not stream.feed(bl, "fr")
+    stream.reset()
+    assert not stream.feed(bl, "ick")
+
+
+def test_stream_restarts_when_the_words_change():
+    stream = BlacklistStream()
+    assert not stream.feed(stream_blacklist(super=("frick",)), "fr")
+    assert not stream.feed(stream_blacklist(super=("frack",)), "ick")
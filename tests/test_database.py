@@ -0,0 +1,94 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from utils.datamodels import Database
+from utils.enums import FetchMode
+
+
+class FakeConnection:
+    def __init__(self):
+        self.queries = []
+
+    async def execute(self, query, *args):
+        self.queries.append((query, args))
+        return "UPDATE 1"
+
+    async def fetchval(self, query, *args):
+        self.queries.append((query, args))
+        return 42
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self.connection
+
+
+class FailingConnection(FakeConnection):
+    async def fetchval(self, query, *args):
+        raise RuntimeError("connection lost")
+
+
+@pytest.fixture
+def db() -> Database:
+    db = Database()
+    db._pool = FakePool()
+    return db
+
+
+def test_execute(db: Database):
+    assert asyncio.run(db.execute("UPDATE guilds SET x = $1", 1)) == "UPDATE 1"
+    assert asyncio.run(db.execute("SELECT x FROM guilds", fetch_mode=FetchMode.VAL)) == 42
+    assert db._pool.connection.queries == [("UPDATE guilds SET x = $1", (1,)), ("SELECT x FROM guilds", ())]
+
+    queries = db.metrics.snapshot()["queries"]
+    assert queries["UPDATE guilds"]["count"] == 1
+    assert queries["SELECT guilds"]["count"] == 1
+    assert db.metrics.in_flight == 0
+    assert db.metrics.acquire.count == 2
+
+
+def test_execute_error_is_recorded(db: Database):
+    db._pool.connection = FailingConnection()
+    with pytest.raises(RuntimeError):
+        asyncio.run(db.execute("SELECT x FROM guilds", fetch_mode=FetchMode.VAL, name="broken"))
+
+    assert db.metrics.snapshot()["queries"]["broken"]["errors"] == 1
+    assert db.metrics.in_flight == 0
+
+
+def test_snapshot_fetched_before_invalidation_is_not_cached(db: Database):
+    db.known_guilds.add(1)
+    versions = iter(range(1, 100))
+
+    async def execute_prepared(name, *args, fetch_mode=FetchMode.NONE):
+        version = next(versions)
+        if version == 1:
+            # another process commits a change and notifies while this row is in flight
+            db.invalidate_guild(1)
+        return {"id": 1, "prefixes": [f"v{version}"]}
+
+    db.execute_prepared = execute_prepared
+    guild = db.get_guild(1)
+    assert asyncio.run(guild.get_snapshot())["prefixes"] == ("v1",)
+    assert 1 not in db._guilds_cache
+
+    assert asyncio.run(guild.get_snapshot())["prefixes"] == ("v2",)
+    assert asyncio.run(guild.get_snapshot())["prefixes"] == ("v2",)
+
+
+def test_clear_during_fetch_discards_the_row(db: Database):
+    db.known_guilds.add(1)
+
+    async def execute_prepared(name, *args, fetch_mode=FetchMode.NONE):
+        db.clear_guilds_cache()
+        return {"id": 1}
+
+    db.execute_prepared = execute_prepared
+    asyncio.run(db.get_guild(1).get_snapshot())
+    assert 1 not in db._guilds_cache
@@ -0,0 +1,35 @@
+import pytest
+
+from utils.filters.whitelist import compile_whitelist, contains_fonts, parse_range
+
+
+@pytest.mark.parametrize(
+    "entry, expected",
+    [
+        ("Cyrillic", "cyrillic"),
+        ("U+0400-U+04FF", "U+0400-U+04FF"),
+        ("u+401", "U+0401-U+0401"),
+        ("а-я", "U+0430-U+044F"),
+        ("abc", None),
+        ("cafe", None),
+        ("0400-04ff", None),
+        ("U+0500-U+0400", None),
+        ("U+110000", None),
+    ],
+)
+def test_parse_range(entry: str, expected: str | None):
+    assert parse_range(entry) == expected
+
+
+def test_ranges_are_allowed():
+    whitelist = compile_whitelist("abc", ("cyrillic", "U+4E00-U+9FFF"))
+    assert contains_fonts(whitelist, "abc привет 中文") == (False, [])
+    assert contains_fonts(whitelist, "abcd") == (True, ["d"])
+
+
+def test_cjk_does_not_allow_fullwidth_latin():
+    whitelist = compile_whitelist("abcdefghijklmnopqrstuvwxyz", ("cjk",))
+    assert contains_fonts(whitelist, "中文，！")[0] is False
+    is_fonted, chars = contains_fonts(whitelist, "ｆｕｃｋ ｙｏｕ １２３")
+    assert is_fonted
+    assert set(chars) == set("ｆｕｃｋｙｏ１２３")
@@ -1,5 +1,7 @@
 import disnake
 
+from utils.filters.whitelist import SCRIPT_PRESETS
+
 rules_cache: dict[int, list[str]] = {}
 
 
@@ -22,3 +24,14 @@ async def autocomplete_rules(inter: disnake.ApplicationCommandInteraction, arg:
         results = results[:10]
 
     return results
+
+
+async def autocomplete_script_presets(_: disnake.ApplicationCommandInteraction, arg: str):
+    arg = arg.lower()
+    return [name for name in SCRIPT_PRESETS if arg in name][:10]
+
+
+async def autocomplete_whitelist_ranges(inter: disnake.ApplicationCommandInteraction, arg: str):
+    arg = arg.lower()
+    data = await inter.bot.db.get_guild(inter.guild.id).get_whitelist_data()
+    return [entry for entry in data.ranges if arg in entry.lower()][:10]
@@ -1,5 +1,7 @@
+import asyncio
 import inspect
 import sys
+import time
 import traceback
 from datetime import datetime, timedelta
 from os import mkdir
@@ -12,8 +14,16 @@ from exencolorlogs import FileLogger
 from ai import predictor
 from ai.train import train as train_ai
 from utils import embeds, env
-from utils.constants import EMOJIS, LOG_CHANNEL_ID, OWNER_ID, TRAIN_GUILD_IDS, WARNINGS_RESET_INTERVAL
-from utils.datamodels import Database
+from utils.constants import (
+    EMOJIS,
+    INFERENCE_EXECUTOR,
+    INFERENCE_WORKERS,
+    LOG_CHANNEL_ID,
+    OWNER_ID,
+    TRAIN_GUILD_IDS,
+    WARNINGS_RESET_INTERVAL,
+)
+from utils.datamodels import Database, GuildSnapshot
 from utils.views import AntispamView, ReportedNotSpamView, UnbanView, UntimeoutView
 
 REQUIRED_FOLDERS = ("logs",)
@@ -40,6 +50,7 @@ class Bot(commands.InteractionBot):
         self.db: Database = Database()
         self.sys_emojis: embeds.Emojis = embeds.Emojis()
         self.warnings: WarningsManager = WarningsManager(self)
+        self.warmed_up = asyncio.Event()  # set once the guild configs are preloaded into the cache
 
     async def start(self, *args, **kwargs):
         self.log.info("Establishing database connection...")
@@ -52,6 +63,7 @@ class Bot(commands.InteractionBot):
 
         self.log.info("Loading model...")
         predictor.load_model()
+        predictor.setup_executor(INFERENCE_EXECUTOR, INFERENCE_WORKERS)
         self.log.ok("Model loaded")
         self.log.info("Loading extensions...")
         self.load_extensions("./ext")
@@ -71,6 +83,8 @@ class Bot(commands.InteractionBot):
     async def close(self):
         self.log.info("Shutting down the bot...")
         await self.db.close()
+        if predictor.executor is not None:
+            predictor.executor.shutdown()
         await super().close()
 
     def run(self):
@@ -88,6 +102,36 @@ class Bot(commands.InteractionBot):
 
         self.log_channel = await self.fetch_channel(LOG_CHANNEL_ID)
         self.owner = self.get_user(OWNER_ID)
+        if self.warmed_up.is_set():
+            try:
+                await self.register_guilds()
+            except Exception:
+                self.log.exception("Failed to register the guilds, they will be registered on demand")
+        else:
+            await self.warmup()
+
+    async def register_guilds(self):
+        started = time.perf_counter()
+        await self.db.register_guilds(g.id for g in self.guilds)
+        self.log.info("Registered %s guilds in %.2fs", len(self.guilds), time.perf_counter() - started)
+
+    async def warmup(self):
+        total = len(self.guilds)
+        try:
+            await self.register_guilds()
+            self.log.info("Warming up configs of %s guilds...", total)
+            started = time.perf_counter()
+            loaded = await self.db.warmup_guilds(
+                [g.id for g in self.guilds],
+                lambda n: self.log.info("Warmed up %s/%s guild configs (%.2fs)", n, total, time.perf_counter() - started),
+            )
+            self.log.ok("Warmed up %s guild configs in %.2fs", loaded, time.perf_counter() - started)
+        except Exception:
+            # the configs are loaded on demand anyway, the warmup only saves the first messages from waiting on them
+            self.log.exception("Failed to warm up the guild configs")
+        finally:
+            # messages must not wait forever if the warmup failed
+            self.warmed_up.set()
 
     async def on_error(self, event_method: str, *args, **kwargs):
         self.log.error("Unhandled exception occurred at %s", event_method)
@@ -152,18 +196,20 @@ class WarningsManager:
         else:
             return self._warnings[author.guild.id][author.id]
 
-    async def add_warning(self, message: disnake.Message):
+    async def add_warning(self, message: disnake.Message, snapshot: GuildSnapshot | None = None):
         current_warnings = self.get_warnings(message.author)
         self._warnings[message.guild.id][message.author.id] += 1
         guild_data = self.bot.db.get_guild(message.guild.id)
-        duration, threshold = await guild_data.get_warnings_data()
+        if snapshot is None:
+            snapshot = await guild_data.get_snapshot()
+        duration, threshold = snapshot.warnings
         if current_warnings >= threshold and message.author.current_timeout is None:
             await message.channel.send(f"**{self.bot.sys_emojis.checkmark} {message.author.mention}, enjoy your mute!**")
             await message.author.timeout(
                 duration=timedelta(minutes=duration),
                 reason="Warnings threshold exceed.",
             )
-            log = await guild_data.get_logger(self.bot)
+            log = await guild_data.get_logger(self.bot, snapshot)
             await log.log_timeout(message.author, duration)
             self._warnings[message.guild.id][message.author.id] = 0
             return -1
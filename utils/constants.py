@@ -2,9 +2,26 @@ OWNER_ID = 664911300769349666
 MAX_SPAM_QUEUE_SIZE = 7
 MAX_BLACKLIST_QUEUE_SIZE = 10
 MAX_AUTOSLOWMODE_CHANNELS_AMOUNT = 10
+MAX_BLACKLIST_WORDS = 5000  # per mode
 AUTOSLOWMODE_EDIT_DELAY = 10
 SPAM_VERIFICATION_THRESHOLD = 3
 WARNINGS_RESET_INTERVAL = 15
+STATS_FLUSH_INTERVAL = 5
+SAMPLE_QUEUE_SIZE = 5000
+SAMPLE_BATCH_SIZE = 500
+SAMPLE_FLUSH_INTERVAL = 2
+GUILDS_WARMUP_BATCH = 1000
+AUTOMATON_CACHE_SIZE = 2048
+NORMALIZATION_CACHE_SIZE = 10000
+WHITELIST_CACHE_SIZE = 1024
+BLACKLIST_STREAM_TTL = 120
+BATCH_CHUNK_SIZE = 500
+NICKFILTER_SWEEP_CHUNK_SIZE = 1000
+NICKFILTER_SWEEP_PROGRESS_INTERVAL = 5
+INFERENCE_BATCH_SIZE = 64
+INFERENCE_BATCH_WAIT = 0.003
+INFERENCE_EXECUTOR = "thread"  # or "process"
+INFERENCE_WORKERS = 2
 EMOJIS = {
     "exclamation": 962804584026370079,
     "checkmark": 962807021126709298,
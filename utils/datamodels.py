@@ -1,22 +1,66 @@
+import time
 from collections import namedtuple
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Optional
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Mapping, Optional
 
 import asyncpg
 import disnake
+from disnake.ext import tasks
 from exencolorlogs import FileLogger
 
 from ai.analyser import analyse_sample
 from utils import autocomplete, env, errors
-from utils.constants import MAX_AUTOSLOWMODE_CHANNELS_AMOUNT
+from utils.constants import GUILDS_WARMUP_BATCH, MAX_AUTOSLOWMODE_CHANNELS_AMOUNT, MAX_BLACKLIST_WORDS, STATS_FLUSH_INTERVAL
 from utils.db_updater import update_db
 from utils.dis_logging import GuildLogger
 from utils.enums import AntiraidPunishment, BlacklistMode, FetchMode, Stat
 from utils.errors import AutoslowmodeChannelAlreadyExists, AutoslowmodeChannelsLimitReached
-from utils.filters.blacklist import preformat
+from utils.filters.blacklist import get_template, preformat
+from utils.ingestion import SampleIngestor
+from utils.invalidation import InvalidationBus
+from utils.metrics import DatabaseMetrics, describe_query
 
 warnings_data = namedtuple("warnings_data", ["timeout_duration", "warnings_threshold"])
 
+BLACKLIST_COLUMNS = tuple("blacklist_" + mode.value for mode in BlacklistMode)
+# a whole guild config: the guilds row with the blacklisted words of every mode as arrays
+GUILD_SELECTION = "SELECT *, " + ", ".join(
+    f"ARRAY(SELECT word FROM blacklist_words WHERE guild_id = guilds.id AND mode = '{mode.value}' ORDER BY id) "
+    f"AS blacklist_{mode.value}"
+    for mode in BlacklistMode
+)
+
+# hot queries that are prepared once per connection and reused, see Database.execute_prepared
+PREPARED_QUERIES = {
+    "select_guild": GUILD_SELECTION + " FROM guilds WHERE id = $1",
+    "flush_stats": "UPDATE stats SET applied_totally = applied_totally + v.amount, applied_daily = applied_daily + v.amount "
+    "FROM UNNEST($1::INT[], $2::INT[]) AS v(id, amount) WHERE stats.id = v.id",
+    "count_autoslowmode_channels": "SELECT COUNT(*) FROM autoslowmode WHERE guild_id = $1",
+    "is_autoslowmode_channel": "SELECT EXISTS(SELECT 1 FROM autoslowmode WHERE id = $1)",
+    "select_autoslowmode_channels": "SELECT id FROM autoslowmode",
+    "select_autoslowmode_channels_for_guild": "SELECT id FROM autoslowmode WHERE guild_id = $1",
+}
+
+
+class PreparingConnection(asyncpg.Connection):
+    """Connection that lazily prepares the `PREPARED_QUERIES` and keeps them for its whole lifetime."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._prepared: dict[str, asyncpg.prepared_stmt.PreparedStatement] = {}
+
+    async def get_prepared(self, name: str) -> asyncpg.prepared_stmt.PreparedStatement:
+        stmt = self._prepared.get(name)
+        if stmt is None:
+            stmt = self._prepared[name] = await self.prepare(PREPARED_QUERIES[name])
+
+        return stmt
+
+    def forget_prepared(self, name: str):
+        self._prepared.pop(name, None)
+
 
 class Database:
     _pool: asyncpg.Pool
@@ -32,19 +76,67 @@ class Database:
             self._connection_config["password"] = env.db.PASSWORD
 
         self._connection_config.update(connection_config)
+        self._pool_config = {
+            "min_size": env.db.POOL_MIN_SIZE,
+            "max_size": env.db.POOL_MAX_SIZE,
+            "max_inactive_connection_lifetime": env.db.POOL_MAX_INACTIVE_CONNECTION_LIFETIME,
+            "statement_cache_size": env.db.STATEMENT_CACHE_SIZE,
+            "connection_class": PreparingConnection,
+        }
+        self._guilds_cache: dict[int, GuildSnapshot] = {}
+        # bumped by the invalidations, a row fetched before one of them must not be cached, see `_cache_snapshot`
+        self._guild_invalidations: dict[int, int] = {}
+        self._cache_epoch = 0
+        # guilds that are known to have a row, so reads and updates can skip the existence check
+        self.known_guilds: set[int] = set()
+
+        # stat increases are accumulated in memory and written by stats_flusher
+        self._pending_stats: dict[Stat, int] = {}
+        self.ingestor = SampleIngestor(self)
+        self.metrics = DatabaseMetrics()
+
+        self.bus = InvalidationBus(self)
+        self.bus.subscribe("guild", self._on_guild_invalidation)
+        self.bus.subscribe("rules", self._on_rules_invalidation)
 
     async def connect(self):
         self.log.info("Creating connection pool...")
-        self._pool = await asyncpg.create_pool(**self._connection_config)
+        self._pool = await asyncpg.create_pool(**self._connection_config, **self._pool_config)
         self.log.ok("Connection pool created successfully!")
+        await self.bus.connect()
+        self.stats_flusher.start()
+        self.ingestor.start()
 
     async def close(self):
+        await self.ingestor.close()
+        self.stats_flusher.cancel()
+        await self.flush_stats()
+        await self.bus.close()
         self.log.info("Closing connection pool...")
         await self._pool.close()
         self.log.ok("Connection pool closed successfully")
 
-    async def execute(self, query: str, *args, fetch_mode: FetchMode = FetchMode.NONE) -> None | list[dict] | dict | Any:
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[PreparingConnection]:
+        """Acquires a pool connection recording how long it took."""
+        started = time.perf_counter()
         async with self._pool.acquire() as con:
+            self.metrics.acquire.observe(time.perf_counter() - started)
+            yield con
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {
+            "pool_size": self._pool.get_size(),
+            "pool_idle": self._pool.get_idle_size(),
+            "pool_max_size": self._pool.get_max_size(),
+            **self.metrics.snapshot(),
+        }
+
+    async def execute(
+        self, query: str, *args, fetch_mode: FetchMode = FetchMode.NONE, name: Optional[str] = None
+    ) -> None | list[dict] | dict | Any:
+        """`name` is the key the query is recorded under in metrics, derived from the query itself if not passed."""
+        async with self.acquire() as con, self.metrics.track(name or describe_query(query)):
             con: asyncpg.Connection
             match fetch_mode:  # noqa: E999
                 case FetchMode.NONE:
@@ -56,6 +148,35 @@ class Database:
                 case FetchMode.ALL:
                     return await con.fetch(query, *args)
 
+    async def execute_prepared(
+        self, name: str, *args, fetch_mode: FetchMode = FetchMode.NONE
+    ) -> None | list[dict] | dict | Any:
+        if self._pool_config["statement_cache_size"] == 0:
+            return await self.execute(PREPARED_QUERIES[name], *args, fetch_mode=fetch_mode, name=name)
+
+        async with self.acquire() as con, self.metrics.track(name):
+            con: PreparingConnection
+            try:
+                return await self._run_prepared(con, name, args, fetch_mode)
+            except (asyncpg.InvalidCachedStatementError, asyncpg.OutdatedSchemaCacheError):
+                # the schema changed since the statement was prepared, e.g. a column was added to guilds
+                con.forget_prepared(name)
+                return await self._run_prepared(con, name, args, fetch_mode)
+
+    @staticmethod
+    async def _run_prepared(con: PreparingConnection, name: str, args: tuple, fetch_mode: FetchMode):
+        stmt = await con.get_prepared(name)
+        match fetch_mode:
+            case FetchMode.NONE:
+                await stmt.fetch(*args)
+                return stmt.get_statusmsg()
+            case FetchMode.VAL:
+                return await stmt.fetchval(*args)
+            case FetchMode.ROW:
+                return await stmt.fetchrow(*args)
+            case FetchMode.ALL:
+                return await stmt.fetch(*args)
+
     async def setup(self, filename: str = "base_config.sql"):
         self.log.info("Executing setup statements...")
         with open(filename, "r") as f:
@@ -80,13 +201,79 @@ class Database:
     def get_guild(self, id: int) -> "GuildData":
         return GuildData(self, id)
 
+    async def register_guilds(self, ids: Iterable[int]):
+        ids = list(ids)
+        await self.execute("INSERT INTO guilds (id) SELECT UNNEST($1::BIGINT[]) ON CONFLICT DO NOTHING", ids)
+        self.known_guilds.update(ids)
+
+    async def warmup_guilds(self, ids: list[int], on_progress: Optional[Callable[[int], Any]] = None) -> int:
+        """Streams the rows of the given guilds into the settings cache with a single cursor query.
+        `on_progress` is called with the amount of loaded rows after every batch. Returns the amount of loaded rows."""
+        loaded = 0
+        epoch, invalidations = self._cache_epoch, dict(self._guild_invalidations)
+        async with self.acquire() as con, self.metrics.track("warmup_guilds"):
+            async with con.transaction():
+                async for record in con.cursor(
+                    GUILD_SELECTION + " FROM guilds WHERE id = ANY($1::BIGINT[])", ids, prefetch=GUILDS_WARMUP_BATCH
+                ):
+                    id = record["id"]
+                    self._cache_snapshot(id, GuildSnapshot(record), (epoch, invalidations.get(id, 0)))
+                    loaded += 1
+                    if on_progress is not None and loaded % GUILDS_WARMUP_BATCH == 0:
+                        on_progress(loaded)
+
+        return loaded
+
+    async def _make_snapshot(self, record: asyncpg.Record) -> "GuildSnapshot":
+        """Builds a snapshot from a bare `guilds` row. The blacklisted words of the cached snapshot are reused
+        if their version has not changed, otherwise the whole config is selected again."""
+        cached = self._guilds_cache.get(record["id"])
+        if cached is not None and cached["blacklist_version"] == record["blacklist_version"]:
+            return GuildSnapshot(record, cached.blacklist_words)
+
+        return GuildSnapshot(await self.execute_prepared("select_guild", record["id"], fetch_mode=FetchMode.ROW))
+
+    def invalidate_guild(self, id: int):
+        self._guild_invalidations[id] = self._guild_invalidations.get(id, 0) + 1
+        self._guilds_cache.pop(id, None)
+
+    def clear_guilds_cache(self):
+        self._cache_epoch += 1
+        self._guilds_cache.clear()
+
+    def _cache_token(self, id: int) -> tuple[int, int]:
+        """Identifies the invalidations of the guild so far, taken before fetching its row."""
+        return self._cache_epoch, self._guild_invalidations.get(id, 0)
+
+    def _cache_snapshot(
+        self, id: int, snapshot: "GuildSnapshot", token: tuple[int, int], replace: bool = False
+    ) -> "GuildSnapshot":
+        """Caches the snapshot unless the guild was invalidated since `token` was taken, the row may predate the
+        change then. Without `replace` an entry cached in the meantime is kept, it is at least as fresh.
+        Returns the snapshot that should be used."""
+        if token != self._cache_token(id):
+            return snapshot
+        if replace:
+            self._guilds_cache[id] = snapshot
+            return snapshot
+
+        return self._guilds_cache.setdefault(id, snapshot)
+
+    def _on_guild_invalidation(self, payload: dict[str, Any]):
+        if "guild_id" in payload:
+            self.invalidate_guild(payload["guild_id"])
+        else:
+            self.clear_guilds_cache()
+
+    @staticmethod
+    def _on_rules_invalidation(payload: dict[str, Any]):
+        if "guild_id" in payload:
+            autocomplete.invalidate_rules(payload["guild_id"])
+        else:
+            autocomplete.rules_cache.clear()
+
     async def register_message(self, content: str):
-        data = analyse_sample(content)
-        await self.execute(
-            "INSERT INTO data (total_chars, unique_chars, total_words, unique_words, content) \
-VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING",
-            *data,
-        )
+        self.ingestor.put(content)
 
     async def modify_message_score(self, id: int, upvote: bool):
         if upvote:
@@ -127,24 +314,45 @@ VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING",
         )
 
     async def register_stat_increase(self, stat: Stat, amount: int = 1):
-        await self.execute(
-            "UPDATE stats SET applied_totally = applied_totally + $2, applied_daily = applied_daily + $2 WHERE id = $1",
-            stat.value,
-            amount,
-        )
+        self._pending_stats[stat] = self._pending_stats.get(stat, 0) + amount
+
+    async def flush_stats(self):
+        if len(self._pending_stats) == 0:
+            return
+
+        pending, self._pending_stats = self._pending_stats, {}
+        try:
+            await self.execute_prepared(
+                "flush_stats",
+                [stat.value for stat in pending],
+                list(pending.values()),
+            )
+        except Exception:
+            for stat, amount in pending.items():
+                self._pending_stats[stat] = self._pending_stats.get(stat, 0) + amount
+            raise
+
+    @tasks.loop(seconds=STATS_FLUSH_INTERVAL)
+    async def stats_flusher(self):
+        try:
+            await self.flush_stats()
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+            self.log.warning("Failed to flush stats, will retry: %s", e)
 
     async def get_stats(self) -> str:
         data = await self.execute("SELECT * FROM stats ORDER BY id", fetch_mode=FetchMode.ALL)
         text = ""
         for record in data:
+            pending = self._pending_stats.get(Stat(record["id"]), 0)
             text += (
-                f"\n**{Stat(record['id']).name.replace('_', ' ').title()}:** `{record['applied_totally']}` total, "
-                f"`{record['applied_daily']}` daily"
+                f"\n**{Stat(record['id']).name.replace('_', ' ').title()}:** `{record['applied_totally'] + pending}` total, "
+                f"`{record['applied_daily'] + pending}` daily"
             )
 
         return text
 
     async def reset_daily_stats(self):
+        await self.flush_stats()
         await self.execute("UPDATE stats SET applied_daily = 0")
         await self.update_daily_reset()
 
@@ -155,8 +363,8 @@ VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING",
         await self.execute("UPDATE resets SET value = CURRENT_TIMESTAMP WHERE id = 0")
 
     async def add_autoslowmode_channel(self, channel: disnake.TextChannel):
-        amount: int = await self.execute(
-            "SELECT COUNT(*) FROM autoslowmode WHERE guild_id = $1",
+        amount: int = await self.execute_prepared(
+            "count_autoslowmode_channels",
             channel.guild.id,
             fetch_mode=FetchMode.VAL,
         )
@@ -172,13 +380,16 @@ VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING",
         except asyncpg.UniqueViolationError:
             raise AutoslowmodeChannelAlreadyExists(channel.id)
 
+        await self.bus.publish("autoslowmode", channel_id=channel.id, added=True)
+
     async def remove_autoslowmode_channel(self, channel_id: int):
         await self.execute("DELETE FROM autoslowmode WHERE id = $1", channel_id)
+        await self.bus.publish("autoslowmode", channel_id=channel_id, added=False)
 
     async def is_channel_autoslowmode(self, channel: disnake.TextChannel):
         return bool(
-            await self.execute(
-                "SELECT EXISTS(SELECT 1 FROM autoslowmode WHERE id = $1)",
+            await self.execute_prepared(
+                "is_autoslowmode_channel",
                 channel.id,
                 fetch_mode=FetchMode.VAL,
             )
@@ -187,8 +398,8 @@ VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING",
     async def get_autoslowmode_channels(self) -> list[int]:
         return [
             r["id"]
-            for r in await self.execute(
-                "SELECT id FROM autoslowmode",
+            for r in await self.execute_prepared(
+                "select_autoslowmode_channels",
                 fetch_mode=FetchMode.ALL,
             )
         ]
@@ -196,8 +407,8 @@ VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING",
     async def get_autoslowmode_channels_for_guild(self, guild_id: int) -> list[int]:
         return [
             r["id"]
-            for r in await self.execute(
-                "SELECT id FROM autoslowmode WHERE guild_id = $1",
+            for r in await self.execute_prepared(
+                "select_autoslowmode_channels_for_guild",
                 guild_id,
                 fetch_mode=FetchMode.ALL,
             )
@@ -205,49 +416,46 @@ VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING",
 
 
 class SubData:
-    _guild: "GuildData"
+    """A view over the prefixed columns of a guild snapshot, e.g. `antispam_enabled` -> `AntiSpamData.enabled`."""
 
-    def __init__(self, guild: "GuildData"):
-        self._guild = guild
+    __slots__ = ()
 
-    async def load(self):
+    def __init__(self, snapshot: "GuildSnapshot"):
         prefix: str = self.__class__.__name__.replace("Data", "").lower() + "_"
-        data = await self._guild._select(", ".join(prefix + slot for slot in self.__slots__ if not slot.startswith("_")))
-        for k, v in data.items():
-            setattr(self, k.replace(prefix, ""), v)
+        for slot in self.__slots__:
+            setattr(self, slot, snapshot[prefix + slot])
 
 
 class AntiSpamData(SubData):
-    _guild: "GuildData"
     enabled: bool
-    ignored: list[int]
+    ignored: tuple[int, ...]
 
-    __slots__ = ["_guild", "enabled", "ignored"]
+    __slots__ = ["enabled", "ignored"]
 
 
 class BlacklistData(SubData):
-    _guild: "GuildData"
     enabled: bool
-    ignored: list[int]
-    common: list[str]
-    wild: list[str]
-    super: list[str]
+    ignored: tuple[int, ...]
+    common: tuple[str, ...]
+    wild: tuple[str, ...]
+    super: tuple[str, ...]
     filter_enabled: bool
+    version: int  # unique between all the guilds, identifies the words lists
+    template: str | None  # shared template checked along with the own words, see `filters.blacklist.get_template`
 
-    __slots__ = ["enabled", "ignored", "common", "wild", "super", "filter_enabled"]
+    __slots__ = ["enabled", "ignored", "common", "wild", "super", "filter_enabled", "version", "template"]
 
 
 class WhitelistData(SubData):
-    _guild: "GuildData"
     enabled: bool
     characters: str
-    ignored: list[int]
+    ranges: tuple[str, ...]  # script names and codepoint intervals, see `filters.whitelist.parse_range`
+    ignored: tuple[int, ...]
 
-    __slots__ = ["enabled", "characters", "ignored"]
+    __slots__ = ["enabled", "characters", "ranges", "ignored"]
 
 
 class AntiraidData(SubData):
-    _guild: "GuildData"
     enabled: bool
     join_interval: int
     members_limit: int
@@ -256,11 +464,75 @@ class AntiraidData(SubData):
 
     __slots__ = ["enabled", "join_interval", "members_limit", "punishment", "invite_pause_duration"]
 
-    async def load(self):
-        await super().load()
+    def __init__(self, snapshot: "GuildSnapshot"):
+        super().__init__(snapshot)
         self.punishment = AntiraidPunishment(self.punishment)
 
 
+class GuildSnapshot:
+    """Immutable copy of a whole `guilds` row. Loaded with a single query and shared by everything that handles
+    one event, the sub-configs are built lazily as views over it."""
+
+    id: int
+
+    __slots__ = ["id", "_row", "_views"]
+
+    def __init__(self, record: Mapping[str, Any], blacklist_words: Optional[Mapping[str, tuple[str, ...]]] = None):
+        self.id = record["id"]
+        row = {k: tuple(v) if isinstance(v, list) else v for k, v in record.items()}
+        if blacklist_words is not None:
+            row.update(blacklist_words)
+        self._row: Mapping[str, Any] = MappingProxyType(row)
+        self._views: dict[type[SubData], SubData] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        return self._row[key]
+
+    def _view(self, cls: type[SubData]) -> Any:
+        view = self._views.get(cls)
+        if view is None:
+            view = self._views[cls] = cls(self)
+
+        return view
+
+    @property
+    def antispam(self) -> AntiSpamData:
+        return self._view(AntiSpamData)
+
+    @property
+    def blacklist(self) -> BlacklistData:
+        return self._view(BlacklistData)
+
+    @property
+    def blacklist_words(self) -> dict[str, tuple[str, ...]]:
+        return {column: self[column] for column in BLACKLIST_COLUMNS}
+
+    @property
+    def whitelist(self) -> WhitelistData:
+        return self._view(WhitelistData)
+
+    @property
+    def antiraid(self) -> AntiraidData:
+        return self._view(AntiraidData)
+
+    @property
+    def warnings(self) -> warnings_data:
+        return warnings_data(self["timeout_duration"], self["warnings_threshold"])
+
+    @property
+    def nickfilter(self) -> tuple[bool, tuple[int, ...]]:
+        """`enabled, ignored = snapshot.nickfilter`"""
+        return self["nickfilter_enabled"], self["nickfilter_ignored"]
+
+    @property
+    def log_channel_id(self) -> int | None:
+        return self["log_channel"]
+
+    @property
+    def automod_managers(self) -> tuple[int, ...]:
+        return self["automod_managers"]
+
+
 class GuildData:
     id: int
 
@@ -269,7 +541,27 @@ class GuildData:
         self._db = _db
 
     async def _validate_existence(self):
+        if self.id in self._db.known_guilds:
+            return
+
         await self._db.execute("INSERT INTO guilds (id) VALUES ($1) ON CONFLICT DO NOTHING", self.id)
+        self._db.known_guilds.add(self.id)
+
+    async def get_snapshot(self) -> GuildSnapshot:
+        snapshot = self._db._guilds_cache.get(self.id)
+        if snapshot is not None:
+            return snapshot
+
+        await self._validate_existence()
+        token = self._db._cache_token(self.id)
+        record = await self._db.execute_prepared("select_guild", self.id, fetch_mode=FetchMode.ROW)
+        if record is None:
+            # the row was deleted after the guild had been marked as known
+            self._db.known_guilds.discard(self.id)
+            return await self.get_snapshot()
+
+        # an update may have refreshed the entry while the row was being fetched, its data is newer
+        return self._db._cache_snapshot(self.id, GuildSnapshot(record), token)
 
     async def _select(self, args: str, fetch_mode: FetchMode = FetchMode.ROW):
         args_amount = len(args.split(","))
@@ -278,8 +570,34 @@ class GuildData:
         elif fetch_mode != FetchMode.VAL and args_amount <= 1:
             self._db.log.warning("Selection of single field with %s: %s:", fetch_mode, args)
 
+        snapshot = await self.get_snapshot()
+        # arrays are handed out as lists, callers mutate them before passing to _update
+        data = {
+            k: list(snapshot[k]) if isinstance(snapshot[k], tuple) else snapshot[k] for k in map(str.strip, args.split(","))
+        }
+        if fetch_mode == FetchMode.VAL:
+            return next(iter(data.values()))
+
+        return data
+
+    async def _modify(self, assignments: str, *args, name: str, condition: Optional[str] = None) -> bool:
+        """Runs `UPDATE guilds SET <assignments> WHERE id = $1 [AND <condition>]` and refreshes the cached snapshot
+        with the returned row. Returns whether the row was updated."""
         await self._validate_existence()
-        return await self._db.execute(f"SELECT {args} FROM guilds WHERE id = $1", self.id, fetch_mode=fetch_mode)
+        token = self._db._cache_token(self.id)
+        record = await self._db.execute(
+            f"UPDATE guilds SET {assignments} WHERE id = $1{f' AND ({condition})' if condition else ''} RETURNING *",
+            self.id,
+            *args,
+            fetch_mode=FetchMode.ROW,
+            name=name,
+        )
+        if record is None:
+            return False
+
+        self._db._cache_snapshot(self.id, await self._db._make_snapshot(record), token, replace=True)
+        await self._db.bus.publish("guild", guild_id=self.id)
+        return True
 
     async def _update(self, **kwargs):
         text = ""
@@ -287,61 +605,57 @@ class GuildData:
             text += f"{k} = ${i}, "
 
         text = text[:-2]
-        await self._validate_existence()
-        await self._db.execute(f"UPDATE guilds SET {text} WHERE id = $1", self.id, *kwargs.values())
+        if not await self._modify(text, *kwargs.values(), name=f"update_guild ({', '.join(kwargs)})"):
+            self._db.known_guilds.discard(self.id)
+            await self._update(**kwargs)
+
+    async def _array_append(self, column: str, value: Any) -> bool:
+        """Appends the value to the array column unless it is already there. Returns whether it was appended."""
+        return await self._modify(
+            f"{column} = ARRAY_APPEND({column}, $2)",
+            value,
+            condition=f"NOT $2 = ANY({column})",
+            name=f"append_guild ({column})",
+        )
+
+    async def _array_remove(self, column: str, value: Any) -> bool:
+        """Removes the value from the array column. Returns whether it was there."""
+        return await self._modify(
+            f"{column} = ARRAY_REMOVE({column}, $2)",
+            value,
+            condition=f"$2 = ANY({column})",
+            name=f"remove_guild ({column})",
+        )
 
     async def get_prefixes(self) -> list[str]:
         return await self._select("prefixes", FetchMode.VAL)
 
     async def get_antispam_data(self) -> AntiSpamData:
-        data = AntiSpamData(self)
-        await data.load()
-
-        return data
+        return (await self.get_snapshot()).antispam
 
     async def get_blacklist_data(self) -> BlacklistData:
-        data = BlacklistData(self)
-        await data.load()
-
-        return data
+        return (await self.get_snapshot()).blacklist
 
-    async def get_automod_managers(self) -> list[int]:
-        return await self._select("automod_managers", FetchMode.VAL)
+    async def get_automod_managers(self) -> tuple[int, ...]:
+        return (await self.get_snapshot()).automod_managers
 
     async def add_automod_manager(self, value: int):
-        managers = await self.get_automod_managers()
-        if value in managers:
+        if not await self._array_append("automod_managers", value):
             raise errors.AlreadyManager(value)
 
-        managers.append(value)
-        await self._update(automod_managers=managers)
-
     async def remove_automod_manager(self, value: int):
-        try:
-            managers = await self.get_automod_managers()
-            managers.remove(value)
-        except ValueError:
+        if not await self._array_remove("automod_managers", value):
             raise errors.NotManager(value)
 
-        await self._update(automod_managers=managers)
-
     async def set_antispam_enabled(self, value: bool):
         await self._update(antispam_enabled=value)
 
     async def add_antispam_ignored(self, value: int):
-        ignored = await self._select("antispam_ignored", FetchMode.VAL)
-        if value in ignored:
+        if not await self._array_append("antispam_ignored", value):
             raise errors.AlreadyIgnored(value)
 
-        ignored.append(value)
-        await self._update(antispam_ignored=ignored)
-
     async def remove_antispam_ignored(self, value: int):
-        try:
-            ignored: list[int] = await self._select("antispam_ignored", FetchMode.VAL)
-            ignored.remove(value)
-            await self._update(antispam_ignored=ignored)
-        except ValueError:
+        if not await self._array_remove("antispam_ignored", value):
             raise errors.NotIgnored(value)
 
     async def set_blacklist_enabled(self, value: bool):
@@ -351,64 +665,136 @@ class GuildData:
         await self._update(blacklist_filter_enabled=value)
 
     async def add_blacklist_ignored(self, value: int):
-        ignored = await self._select("blacklist_ignored", FetchMode.VAL)
-        if value in ignored:
+        if not await self._array_append("blacklist_ignored", value):
             raise errors.AlreadyIgnored(value)
 
-        ignored.append(value)
-        await self._update(blacklist_ignored=ignored)
-
     async def remove_blacklist_ignored(self, value: int):
-        try:
-            ignored = await self._select("blacklist_ignored", FetchMode.VAL)
-            ignored.remove(value)
-            await self._update(blacklist_ignored=ignored)
-        except ValueError:
+        if not await self._array_remove("blacklist_ignored", value):
             raise errors.NotIgnored(value)
 
-    async def add_blacklist_word(self, value: str, mode: BlacklistMode):
-        current: list[str] = await self._select("blacklist_" + mode.value, FetchMode.VAL)
+    async def _modify_blacklist(self, name: str, action: Callable[[asyncpg.Connection], Awaitable[None]]):
+        """Runs `action` in a transaction that also gives the guild a new blacklist version, then refreshes the
+        cached snapshot. Raising from `action` rolls everything back."""
+        await self._validate_existence()
+        token = self._db._cache_token(self.id)
+        async with self._db.acquire() as con, self._db.metrics.track(name):
+            async with con.transaction():
+                # also locks the row, so the modifications of one guild are serialized
+                status = await con.execute(
+                    "UPDATE guilds SET blacklist_version = NEXTVAL('blacklist_versions') WHERE id = $1", self.id
+                )
+                if status != "UPDATE 0":
+                    await action(con)
+                    record = await con.fetchrow(PREPARED_QUERIES["select_guild"], self.id)
 
-        if value in current:
-            raise errors.WordAlreadyExists(value, mode.value)
+        if status == "UPDATE 0":
+            self._db.known_guilds.discard(self.id)
+            await self._modify_blacklist(name, action)
+            return
 
-        current.append(value)
-        try:
-            await self._update(**{"blacklist_" + mode.value: current})
-        except asyncpg.CheckViolationError:
+        self._db._cache_snapshot(self.id, GuildSnapshot(record), token, replace=True)
+        await self._db.bus.publish("guild", guild_id=self.id)
+
+    @staticmethod
+    async def _check_words_amount(con: asyncpg.Connection, guild_id: int, mode: BlacklistMode):
+        amount = await con.fetchval(
+            "SELECT COUNT(*) FROM blacklist_words WHERE guild_id = $1 AND mode = $2", guild_id, mode.value
+        )
+        if amount > MAX_BLACKLIST_WORDS:
             raise errors.WordsThresholdExceeded()
 
+    async def add_blacklist_word(self, value: str, mode: BlacklistMode):
+        async def action(con: asyncpg.Connection):
+            status = await con.execute(
+                "INSERT INTO blacklist_words (guild_id, mode, word) VALUES ($1, $2, $3) ON CONFLICT DO NOTHING",
+                self.id,
+                mode.value,
+                value,
+            )
+            if status == "INSERT 0 0":
+                raise errors.WordAlreadyExists(value, mode.value)
+            await self._check_words_amount(con, self.id, mode)
+
+        await self._modify_blacklist("add_blacklist_word", action)
+
     async def addmany_blacklist_words(self, words: list[str], mode: BlacklistMode):
-        current: set[str] = set(await self._select("blacklist_" + mode.value, FetchMode.VAL))
-        words = set(map(lambda s: preformat(s, mode), words))
+        # deduplicated keeping the order
+        words = list(dict.fromkeys(map(lambda s: preformat(s, mode), words)))
         if "" in words:
             words.remove("")
 
-        current |= words
-        try:
-            await self._update(**{"blacklist_" + mode.value: current})
-        except asyncpg.CheckViolationError:
-            raise errors.WordsThresholdExceeded()
+        async def action(con: asyncpg.Connection):
+            await con.execute(
+                "INSERT INTO blacklist_words (guild_id, mode, word) "
+                "SELECT $1, $2, w FROM UNNEST($3::TEXT[]) WITH ORDINALITY AS t(w, i) ORDER BY i "
+                "ON CONFLICT DO NOTHING",
+                self.id,
+                mode.value,
+                words,
+            )
+            await self._check_words_amount(con, self.id, mode)
+
+        await self._modify_blacklist("addmany_blacklist_words", action)
 
     async def remove_blacklist_word(self, value: str, mode: BlacklistMode):
-        current: list[str] = await self._select("blacklist_" + mode.value, FetchMode.VAL)
-        try:
-            current.remove(value)
-            await self._update(**{"blacklist_" + mode.value: current})
-        except ValueError:
-            raise errors.WordNotFound(value, mode.value)
+        async def action(con: asyncpg.Connection):
+            status = await con.execute(
+                "DELETE FROM blacklist_words WHERE guild_id = $1 AND mode = $2 AND word = $3",
+                self.id,
+                mode.value,
+                value,
+            )
+            if status == "DELETE 0":
+                template_id = await con.fetchval("SELECT blacklist_template FROM guilds WHERE id = $1", self.id)
+                template = get_template(template_id) if template_id is not None else None
+                if template is not None and preformat(value, mode) in template.words(mode):
+                    raise errors.WordFromTemplate(value, mode.value, template_id)
+                raise errors.WordNotFound(value, mode.value)
+
+        await self._modify_blacklist("remove_blacklist_word", action)
+
+    async def set_blacklist_template(self, template_id: Optional[str]):
+        await self._update(blacklist_template=template_id)
+
+    async def detach_blacklist_template(self) -> str:
+        """Copies the words of the used template into the own words of the guild and stops using the template, so
+        that they can be removed one by one. Returns the template id."""
+        template_id = None
+
+        async def action(con: asyncpg.Connection):
+            nonlocal template_id
+            template_id = await con.fetchval("SELECT blacklist_template FROM guilds WHERE id = $1", self.id)
+            if template_id is None:
+                raise errors.NoBlacklistTemplate()
+
+            template = get_template(template_id)
+            if template is not None:
+                for mode in BlacklistMode:
+                    await con.execute(
+                        "INSERT INTO blacklist_words (guild_id, mode, word) "
+                        "SELECT $1, $2, w FROM UNNEST($3::TEXT[]) AS t(w) ORDER BY w ON CONFLICT DO NOTHING",
+                        self.id,
+                        mode.value,
+                        list(template.words(mode)),
+                    )
+                    await self._check_words_amount(con, self.id, mode)
+            await con.execute("UPDATE guilds SET blacklist_template = NULL WHERE id = $1", self.id)
+
+        await self._modify_blacklist("detach_blacklist_template", action)
+        return template_id
 
     async def clear_blacklist(self, mode: Optional[BlacklistMode] = None):
-        if mode is None:
-            await self._update(blacklist_common=[], blacklist_wild=[], blacklist_super=[])
-        else:
-            await self._update(**{"blacklist_" + mode.value: []})
+        async def action(con: asyncpg.Connection):
+            if mode is None:
+                await con.execute("DELETE FROM blacklist_words WHERE guild_id = $1", self.id)
+                await con.execute("UPDATE guilds SET blacklist_template = NULL WHERE id = $1", self.id)
+            else:
+                await con.execute("DELETE FROM blacklist_words WHERE guild_id = $1 AND mode = $2", self.id, mode.value)
 
-    async def get_whitelist_data(self) -> WhitelistData:
-        data = WhitelistData(self)
-        await data.load()
+        await self._modify_blacklist("clear_blacklist", action)
 
-        return data
+    async def get_whitelist_data(self) -> WhitelistData:
+        return (await self.get_snapshot()).whitelist
 
     async def set_whitelist_enabled(self, value: bool):
         await self._update(whitelist_enabled=value)
@@ -432,45 +818,37 @@ class GuildData:
         await self.set_whitelist_characters(str(new))
         return len(current) - len(new)
 
+    async def add_whitelist_range(self, value: str):
+        if not await self._array_append("whitelist_ranges", value):
+            raise errors.RangeAlreadyWhitelisted(value)
+
+    async def remove_whitelist_range(self, value: str):
+        if not await self._array_remove("whitelist_ranges", value):
+            raise errors.RangeNotWhitelisted(value)
+
     async def add_whitelist_ignored(self, value: int):
-        ignored = await self._select("whitelist_ignored", FetchMode.VAL)
-        if value in ignored:
+        if not await self._array_append("whitelist_ignored", value):
             raise errors.AlreadyIgnored(value)
 
-        ignored.append(value)
-        await self._update(whitelist_ignored=ignored)
-
     async def remove_whitelist_ignored(self, value: int):
-        try:
-            ignored = await self._select("whitelist_ignored", FetchMode.VAL)
-            ignored.remove(value)
-            await self._update(whitelist_ignored=ignored)
-        except ValueError:
+        if not await self._array_remove("whitelist_ignored", value):
             raise errors.NotIgnored(value)
 
-    async def get_nickfilter_data(self) -> tuple[bool, list[int]]:
+    async def get_nickfilter_data(self) -> tuple[bool, tuple[int, ...]]:
         """Returns
         ----------
         `enabled, ignored = await guild.get_nickfilter_data()`"""
-        return tuple((await self._select("nickfilter_enabled, nickfilter_ignored")).values())
+        return (await self.get_snapshot()).nickfilter
 
     async def set_nickfilter_enabled(self, value: bool):
         await self._update(nickfilter_enabled=value)
 
     async def add_nickfilter_ignored(self, value: int):
-        ignored = await self._select("nickfilter_ignored", FetchMode.VAL)
-        if value in ignored:
+        if not await self._array_append("nickfilter_ignored", value):
             raise errors.AlreadyIgnored(value)
 
-        ignored.append(value)
-        await self._update(nickfilter_ignored=ignored)
-
     async def remove_nickfilter_ignored(self, value: int):
-        try:
-            ignored = await self._select("nickfilter_ignored", FetchMode.VAL)
-            ignored.remove(value)
-            await self._update(nickfilter_ignored=ignored)
-        except ValueError:
+        if not await self._array_remove("nickfilter_ignored", value):
             raise errors.NotIgnored(value)
 
     async def add_rule(self, key: str, value: str):
@@ -481,13 +859,16 @@ class GuildData:
                 key,
                 value,
             )
-            autocomplete.invalidate_rules(self.id)
         except asyncpg.UniqueViolationError:
             raise errors.RuleAlreadyExists(key)
 
+        autocomplete.invalidate_rules(self.id)
+        await self._db.bus.publish("rules", guild_id=self.id)
+
     async def remove_rule(self, key: str):
         await self._db.execute("DELETE FROM rules WHERE id = $1 AND rule_key = $2", self.id, key)
         autocomplete.invalidate_rules(self.id)
+        await self._db.bus.publish("rules", guild_id=self.id)
 
     async def get_rule(self, key: str) -> str:
         val: str = await self._db.execute(
@@ -513,19 +894,18 @@ class GuildData:
         return {r["rule_key"]: r["rule_text"] for r in rows}
 
     async def get_log_channel_id(self) -> Optional[int]:
-        return await self._select("log_channel", fetch_mode=FetchMode.VAL)
+        return (await self.get_snapshot()).log_channel_id
 
     async def set_log_channel_id(self, id: int | None):
         await self._update(log_channel=id)
 
-    async def get_logger(self, bot) -> GuildLogger:
+    async def get_logger(self, bot, snapshot: Optional[GuildSnapshot] = None) -> GuildLogger:
         log = GuildLogger()
-        await log.load(bot, self.id)
+        await log.load(bot, self.id, snapshot)
         return log
 
     async def get_warnings_data(self) -> warnings_data:
-        r = await self._select("warnings_threshold, timeout_duration")
-        return warnings_data(r["timeout_duration"], r["warnings_threshold"])
+        return (await self.get_snapshot()).warnings
 
     async def set_timeout_duration(self, value: int):
         await self._update(timeout_duration=value)
@@ -534,9 +914,7 @@ class GuildData:
         await self._update(warnings_threshold=value)
 
     async def get_antiraid_data(self) -> AntiraidData:
-        data = AntiraidData(self)
-        await data.load()
-        return data
+        return (await self.get_snapshot()).antiraid
 
     async def set_antiraid_enabled(self, value: bool):
         await self._update(antiraid_enabled=value)
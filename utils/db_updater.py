@@ -2,11 +2,12 @@ from typing import TYPE_CHECKING
 
 from ai.analyser import analyse_sample
 from utils.enums import FetchMode
+from utils.filters.blacklist import get_template
 
 if TYPE_CHECKING:
     from utils.datamodels import Database
 
-version = 12
+version = 15
 
 
 async def update_db(db: "Database"):
@@ -115,6 +116,64 @@ async def update_db(db: "Database"):
                     sqls = ["ALTER TABLE guilds ALTER COLUMN whitelist_characters TYPE VARCHAR(1024)"]
                 case 12:
                     sqls = ["ALTER TABLE guilds ADD COLUMN antiraid_invite_pause_duration INT"]
+                case 13:
+                    sqls = [
+                        "CREATE SEQUENCE IF NOT EXISTS blacklist_versions",
+                        "CREATE TABLE IF NOT EXISTS blacklist_words (id BIGSERIAL PRIMARY KEY, guild_id BIGINT NOT NULL, "
+                        "mode TEXT NOT NULL, word TEXT NOT NULL, UNIQUE (guild_id, mode, word))",
+                        "ALTER TABLE guilds ADD COLUMN IF NOT EXISTS blacklist_version BIGINT DEFAULT 0",
+                    ]
+                    has_arrays = await db.execute(
+                        "SELECT EXISTS(SELECT 1 FROM information_schema.columns "
+                        "WHERE table_name = 'guilds' AND column_name = 'blacklist_common')",
+                        fetch_mode=FetchMode.VAL,
+                    )
+                    if has_arrays:
+                        db.log.info("Moving blacklisted words to the blacklist_words table...")
+                        for mode in ("common", "wild", "super"):
+                            sqls.append(
+                                "INSERT INTO blacklist_words (guild_id, mode, word) "
+                                f"SELECT g.id, '{mode}', w.word FROM guilds g, "
+                                f"UNNEST(g.blacklist_{mode}) WITH ORDINALITY AS w(word, i) "
+                                "ORDER BY g.id, w.i ON CONFLICT DO NOTHING"
+                            )
+                        sqls += [
+                            "UPDATE guilds SET blacklist_version = NEXTVAL('blacklist_versions') "
+                            "WHERE id IN (SELECT DISTINCT guild_id FROM blacklist_words)",
+                            "ALTER TABLE guilds DROP COLUMN blacklist_common, DROP COLUMN blacklist_wild, "
+                            "DROP COLUMN blacklist_super",
+                        ]
+                case 14:
+                    await db.execute("ALTER TABLE guilds ADD COLUMN IF NOT EXISTS blacklist_template TEXT")
+                    # the guilds that loaded the template before hold copies of it, they reference it instead now.
+                    # only the complete copies are converted and `/blacklist detach` brings the copies back
+                    template = get_template("standard")
+                    modes, words = [], []
+                    for mode, mode_words in (
+                        ("common", template.common),
+                        ("wild", template.wild.words),
+                        ("super", template.super.words),
+                    ):
+                        modes += [mode] * len(mode_words)
+                        words += mode_words
+                    await db.execute(
+                        "UPDATE guilds SET blacklist_template = 'standard', "
+                        "blacklist_version = NEXTVAL('blacklist_versions') WHERE id IN ("
+                        "SELECT guild_id FROM blacklist_words WHERE (mode, word) IN "
+                        "(SELECT * FROM UNNEST($1::TEXT[], $2::TEXT[])) GROUP BY guild_id HAVING COUNT(*) = $3)",
+                        modes,
+                        words,
+                        len(words),
+                    )
+                    await db.execute(
+                        "DELETE FROM blacklist_words w USING guilds g "
+                        "WHERE w.guild_id = g.id AND g.blacklist_template = 'standard' "
+                        "AND (w.mode, w.word) IN (SELECT * FROM UNNEST($1::TEXT[], $2::TEXT[]))",
+                        modes,
+                        words,
+                    )
+                case 15:
+                    sqls = ["ALTER TABLE guilds ADD COLUMN whitelist_ranges TEXT[] DEFAULT ARRAY[]::TEXT[]"]
 
             for sql in sqls:
                 async with db._pool.acquire() as con:
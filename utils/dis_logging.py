@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import TYPE_CHECKING, Sequence
+from typing import TYPE_CHECKING, Optional, Sequence
 
 import disnake
 from exencolorlogs import Logger
@@ -11,6 +11,7 @@ from utils.views import AntispamView, UnbanView, UntimeoutView
 
 if TYPE_CHECKING:
     from utils.bot import Bot
+    from utils.datamodels import GuildSnapshot
 
 cooldowns: dict[int, "LogEntry"] = {}
 
@@ -28,12 +29,12 @@ class GuildLogger:
     log: Logger
     bot: "Bot"
 
-    async def load(self, bot: "Bot", guild_id: int):
+    async def load(self, bot: "Bot", guild_id: int, snapshot: Optional["GuildSnapshot"] = None):
         self.bot = bot
         self.guild: disnake.Guild = bot.get_guild(guild_id)
         self.log = Logger(f"GUILDLOG {guild_id}")
         guild = bot.db.get_guild(guild_id)
-        log_id = await guild.get_log_channel_id()
+        log_id = snapshot.log_channel_id if snapshot is not None else await guild.get_log_channel_id()
         if log_id is None:
             self.log_channel = None
         else:
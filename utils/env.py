@@ -13,6 +13,10 @@ class DatabaseEnvironment(EnvironmentProfile):
     USER: str
     HOST: str = "127.0.0.1"
     PASSWORD: str | None = None
+    POOL_MIN_SIZE: int = 10
+    POOL_MAX_SIZE: int = 10
+    POOL_MAX_INACTIVE_CONNECTION_LIFETIME: float = 300.0
+    STATEMENT_CACHE_SIZE: int = 100  # 0 disables prepared statements, required behind pgbouncer in transaction mode
 
 
 load_dotenv()
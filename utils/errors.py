@@ -5,7 +5,7 @@ import exencolor
 from disnake import Forbidden, Interaction, NotFound
 from disnake.ext import commands
 
-from utils.constants import MAX_AUTOSLOWMODE_CHANNELS_AMOUNT
+from utils.constants import MAX_AUTOSLOWMODE_CHANNELS_AMOUNT, MAX_BLACKLIST_WORDS
 
 UNKNOWN = object()
 
@@ -37,11 +37,37 @@ class WordAlreadyExists(DatabaseException):
         super().__init__(f"The expression `{word}` is already added to `{mode}` blacklist!")
 
 
+class WordFromTemplate(DatabaseException):
+    def __init__(self, word: str, mode: str, template: str):
+        super().__init__(
+            f"The expression `{word}` comes from the `{template}` template and cannot be removed on its own. \
+Use `/blacklist detach` to copy the template into the own words of the server first."
+        )
+        self.word = word
+        self.mode = mode
+        self.template = template
+
+
+class NoBlacklistTemplate(DatabaseException):
+    def __init__(self):
+        super().__init__("This server does not use a blacklist template.")
+
+
 class AlreadyIgnored(DatabaseException):
     def __init__(self, id: int):
         super().__init__(f"An object with ID {id} is already ignored.")
 
 
+class RangeAlreadyWhitelisted(DatabaseException):
+    def __init__(self, entry: str):
+        super().__init__(f"The range `{entry}` is already whitelisted!")
+
+
+class RangeNotWhitelisted(DatabaseException):
+    def __init__(self, entry: str):
+        super().__init__(f"The range `{entry}` is not whitelisted and cannot be removed.")
+
+
 class AlreadyManager(DatabaseException):
     def __init__(self, id: int):
         super().__init__(f"An object with ID {id} is already a manager.")
@@ -74,7 +100,9 @@ class ManagerOnly(CustomError):
 
 class WordsThresholdExceeded(DatabaseException):
     def __init__(self):
-        super().__init__("Sorry, but there can be only **50** words per mode. Please delete some to add new.")
+        super().__init__(
+            f"Sorry, but there can be only **{MAX_BLACKLIST_WORDS}** words per mode. Please delete some to add new."
+        )
 
 
 class RuleAlreadyExists(DatabaseException):
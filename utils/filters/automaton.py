@@ -0,0 +1,76 @@
+from collections import deque
+from typing import Iterable
+
+
+class Automaton:
+    """Aho-Corasick automaton finding all the occurrences of a set of words in a single pass over the text.
+
+    Scanning can be resumed from the state returned by the previous `scan`, as if the texts were concatenated."""
+
+    __slots__ = ("words", "_goto", "_fail", "_out")
+
+    def __init__(self, words: Iterable[str]):
+        self.words: frozenset[str] = frozenset(w for w in words if len(w) > 0)
+        goto: list[dict[str, int]] = [{}]
+        out: list[tuple[int, ...]] = [()]
+        for word in self.words:
+            state = 0
+            for char in word:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = goto[state][char] = len(goto)
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = (len(word),)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f != 0 and char not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(char, 0)
+                # states are visited breadth-first, so the outputs of the shorter suffix are already complete
+                out[nxt] += out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def __len__(self):
+        return len(self.words)
+
+    def scan(self, text: str, state: int = 0) -> tuple[list[tuple[int, int]], int]:
+        """Returns the `(start, end)` spans of all the matches, overlapping ones included, and the final state.
+        The spans are ordered by their end."""
+        goto, fail, out = self._goto, self._fail, self._out
+        spans = []
+        for i, char in enumerate(text):
+            nxt = goto[state].get(char)
+            while nxt is None and state != 0:
+                state = fail[state]
+                nxt = goto[state].get(char)
+            state = nxt or 0
+            for length in out[state]:
+                spans.append((i + 1 - length, i + 1))
+
+        return spans, state
+
+    def search(self, text: str) -> bool:
+        """Same as `scan` but stops at the first match."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for char in text:
+            nxt = goto[state].get(char)
+            while nxt is None and state != 0:
+                state = fail[state]
+                nxt = goto[state].get(char)
+            state = nxt or 0
+            if out[state]:
+                return True
+
+        return False
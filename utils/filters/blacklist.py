@@ -1,9 +1,18 @@
+import json
 import re
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import accumulate
+from typing import Any, Callable, Hashable, Iterable, Iterator
 
-from disnake.utils import remove_markdown
-
+from utils.constants import AUTOMATON_CACHE_SIZE, BATCH_CHUNK_SIZE, NORMALIZATION_CACHE_SIZE
 from utils.enums import BlacklistMode
+from utils.filters.automaton import Automaton
 
+TEMPLATES_PATH = "res/templates/blacklist.json"
 BANNED_SYMBOLS = "!@#$%^&*(){}[]<>-_=+?~`:;'\"/\\|<>.,\n"
 SYMBOL_MASK = {
     "!": "i",
@@ -20,91 +29,389 @@ SYMBOL_MASK = {
     "🆎": "ab",
 }
 
-REG_INDICATOR_PATTERN = re.compile(r":regional_indicator_[a-z]:\s*")
+REGIONAL_INDICATORS_START = 0x1F1E6  # 🇦, the regional indicators go in alphabetical order up to 🇿
+# blocks with the compatibility forms and accented versions of latin letters and digits, which are folded to ASCII
+FOLDED_RANGES = (
+    (0x00A0, 0x024F),  # latin-1 supplement, latin extended-a and -b
+    (0x1D00, 0x1DBF),  # phonetic extensions
+    (0x1E00, 0x1EFF),  # latin extended additional
+    (0x2070, 0x218F),  # super- and subscripts, letterlike symbols, number forms
+    (0x2460, 0x24FF),  # enclosed alphanumerics
+    (0xFB00, 0xFB06),  # latin ligatures
+    (0xFF00, 0xFFEF),  # fullwidth forms
+    (0x1D400, 0x1D7FF),  # mathematical alphanumeric symbols
+    (0x1F100, 0x1F1E5),  # enclosed alphanumeric supplement, up to the regional indicators
+)
+# lowercase cyrillic and greek letters that look the same as latin ones, NFKC keeps them as they are
+CONFUSABLES = {
+    "а": "a",
+    "с": "c",
+    "ԁ": "d",
+    "е": "e",
+    "ё": "e",
+    "һ": "h",
+    "і": "i",
+    "ї": "i",
+    "ј": "j",
+    "к": "k",
+    "ӏ": "l",
+    "о": "o",
+    "р": "p",
+    "ԛ": "q",
+    "ѕ": "s",
+    "у": "y",
+    "ԝ": "w",
+    "х": "x",
+    "α": "a",
+    "ι": "i",
+    "κ": "k",
+    "ν": "v",
+    "ο": "o",
+    "ρ": "p",
+    "τ": "t",
+    "υ": "u",
+    "χ": "x",
+    "ω": "w",
+}
+
+
+def _fold(char: str) -> str | None:
+    """Returns the ASCII form of the character if it is a compatibility form or an accented letter."""
+    decomposed = unicodedata.normalize("NFKD", char)
+    folded = "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    if folded == char or not folded.isascii() or (folded.isspace() and not char.isspace()):
+        return None
+
+    return folded
 
 
-def _extract_regional_indicator(s: str) -> str:
-    s = s.replace("regional_indicator_", "")
-    return re.search(r"[a-z]", s).group()
+def _build_translation_table() -> dict[int, str | None]:
+    table: dict[int, str | None] = {ord(s): None for s in BANNED_SYMBOLS}
+    # masking is checked before stripping, e.g. `!` is an `i` and not a removed symbol
+    table.update({ord(s): mask for s, mask in SYMBOL_MASK.items() if len(s) == 1})
+    # folded characters go through the masking too, e.g. fullwidth `！` is `!`, which is an `i`
+    ascii_table = table.copy()
+    for start, end in FOLDED_RANGES:
+        for codepoint in range(start, end + 1):
+            folded = _fold(chr(codepoint))
+            if folded is not None:
+                table[codepoint] = folded.translate(ascii_table)
+    table.update({ord(s): folded for s, folded in CONFUSABLES.items()})
+    table.update({REGIONAL_INDICATORS_START + i: chr(ord("a") + i) for i in range(26)})
+    return table
 
 
-def _find_all_characters(s: str, char: str):
-    positions = []
-    for i, s in enumerate(s):
-        if s == char:
-            positions.append(i)
+TRANSLATION_TABLE = _build_translation_table()
+MULTICHAR_MASK_PATTERN = re.compile(
+    "|".join(re.escape(s) for s in sorted(SYMBOL_MASK, key=len, reverse=True) if len(s) > 1)
+    + r"|:regional_indicator_(?P<indicator>[a-z]):\s*"
+)
 
-    return positions
+
+def _unmask(match: re.Match) -> str:
+    return match.group("indicator") or SYMBOL_MASK[match.group()]
 
 
 def _format_expression(expr: str) -> str:
-    expr = remove_markdown(expr.strip().lower().replace("\n", ""))
-    reg_indicators = set(re.findall(REG_INDICATOR_PATTERN, expr))
-    for ind in reg_indicators:
-        ind: str
-        expr = expr.replace(ind, _extract_regional_indicator(ind))
-
-    new_expr = ""
-    for s in expr:
-        if s in SYMBOL_MASK:
-            new_expr += SYMBOL_MASK[s]
-        elif s in BANNED_SYMBOLS:
-            continue
-        else:
-            new_expr += s
-
-    return new_expr
-
-
-def _apply_common_blacklist_detection(banned_words: list[str], expr: str) -> tuple[bool, str]:
-    curse_words = set(banned_words) & set(expr.split(" "))
+    expr = MULTICHAR_MASK_PATTERN.sub(_unmask, expr.strip().lower())
+    return expr.translate(TRANSLATION_TABLE)
+
+
+class NormalizationCache:
+    """Bounded LRU cache of normalized expressions, so that a message is normalized once however many times it is
+    checked. Keys must change together with the content, e.g. `(message.id, message.content)`."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, str] = OrderedDict()
+
+    def get(self, key: Hashable, expr: str) -> str:
+        try:
+            normalized = self._data[key]
+            self._data.move_to_end(key)
+            self.hits += 1
+            return normalized
+        except KeyError:
+            pass
+
+        self.misses += 1
+        normalized = self._data[key] = _format_expression(expr)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+        return normalized
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total > 0 else 0.0,
+        }
+
+
+normalization_cache = NormalizationCache(NORMALIZATION_CACHE_SIZE)
+
+
+class CompiledWords:
+    """One set of blacklisted words, either the own words of a guild or a template, prepared for matching."""
+
+    __slots__ = ("common", "wild", "super")
+
+    def __init__(self, common: Iterable[str], wild: Iterable[str], super_: Iterable[str]):
+        # the words are normalized again, the stored ones may have been formatted by an older normalizer
+        self.common = frozenset(filter(None, (preformat(w, BlacklistMode.common) for w in common)))
+        self.wild = Automaton(preformat(w, BlacklistMode.wild) for w in wild)
+        self.super = Automaton(preformat(w, BlacklistMode.super) for w in super_)
+
+    def words(self, mode: BlacklistMode) -> frozenset[str]:
+        """Returns the formatted words of the mode."""
+        match mode:
+            case BlacklistMode.common:
+                return self.common
+            case BlacklistMode.wild:
+                return self.wild.words
+            case BlacklistMode.super:
+                return self.super.words
+
+
+@lru_cache(maxsize=AUTOMATON_CACHE_SIZE)
+def _compile_words(common: tuple[str, ...], wild: tuple[str, ...], super_: tuple[str, ...]) -> CompiledWords:
+    return CompiledWords(common, wild, super_)
+
+
+@lru_cache(maxsize=None)
+def load_templates() -> dict[str, dict[str, list[str]]]:
+    """Returns the blacklist templates by their ids, `{template_id: {mode: [words]}}`."""
+    with open(TEMPLATES_PATH, "r") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def get_template(template_id: str) -> CompiledWords | None:
+    """Returns the compiled template, every template is compiled once per process and shared by all the guilds
+    referencing it. Returns `None` for unknown ids."""
+    template = load_templates().get(template_id)
+    if template is None:
+        return None
+
+    return CompiledWords(template.get("common", []), template.get("wild", []), template.get("super", []))
+
+
+def _coverage(spans: list[tuple[int, int]], length: int) -> Iterator[int]:
+    """Yields how many spans cover each position, in linear time however much the spans overlap."""
+    depth = [0] * (length + 1)
+    for start, end in spans:
+        depth[start] += 1
+        depth[end] -= 1
+
+    return accumulate(depth[:length])
+
+
+def _censor(expr: str, spans: list[tuple[int, int]]) -> str:
+    return "".join("#" if covered else char for char, covered in zip(expr, _coverage(spans, len(expr))))
+
+
+def _scan_all(automata: tuple[Automaton, ...], expr: str) -> list[tuple[int, int]]:
+    return [span for automaton in automata for span in automaton.scan(expr)[0]]
+
+
+def _apply_common_blacklist_detection(banned_words: tuple[frozenset[str], ...], expr: str) -> tuple[bool, str]:
+    tokens = set(expr.split(" "))
+    curse_words = set()
+    for words in banned_words:
+        curse_words |= words & tokens
     for word in curse_words:
         expr = expr.replace(word, "#" * len(word))
 
     return len(curse_words) > 0, expr
 
 
-def _apply_wildcard_blacklist_detection(banned_words: list[str], expr: str, break_immediately: bool) -> tuple[bool, str]:
-    is_curse = False
-    for word in banned_words:
-        if word in expr:
-            expr = expr.replace(word, "#" * len(word))
-            is_curse = True
-            if break_immediately:
-                break
+def _apply_wildcard_blacklist_detection(
+    automata: tuple[Automaton, ...], expr: str, break_immediately: bool
+) -> tuple[bool, str]:
+    if break_immediately:
+        return any(automaton.search(expr) for automaton in automata), expr
 
-    return is_curse, expr
+    spans = _scan_all(automata, expr)
+    return len(spans) > 0, _censor(expr, spans) if len(spans) > 0 else expr
 
 
-def _apply_super_blacklist_detection(banned_words: list[str], expr: str, break_immediately: bool) -> tuple[bool, str]:
-    spaces_pos = _find_all_characters(expr, " ")
-    is_curse, expr = _apply_wildcard_blacklist_detection(banned_words, expr.replace(" ", ""), break_immediately)
+def _apply_super_blacklist_detection(
+    automata: tuple[Automaton, ...], expr: str, break_immediately: bool
+) -> tuple[bool, str]:
+    # the words are searched in the expression without spaces, `positions` maps it back to the original one
+    stripped = expr.replace(" ", "")
     if break_immediately:
-        return is_curse, None
+        return any(automaton.search(stripped) for automaton in automata), None
 
-    expr_list = list(expr)
-    for i in spaces_pos:
-        expr_list.insert(i, " ")
+    spans = _scan_all(automata, stripped)
+    if len(spans) == 0:
+        return False, expr
 
-    return is_curse, "".join(expr_list)
+    positions = [i for i, char in enumerate(expr) if char != " "]
+    chars = list(expr)
+    for i, covered in enumerate(_coverage(spans, len(stripped))):
+        if covered:
+            chars[positions[i]] = "#"
 
+    return True, "".join(chars)
 
-def is_blacklisted(bl, expr: str):
-    expr = _format_expression(expr)
-    common_is_curse, expr = _apply_common_blacklist_detection(bl.common, expr)
-    if common_is_curse and not bl.filter_enabled:
-        return True, None
 
-    wild_is_curse, expr = _apply_wildcard_blacklist_detection(bl.wild, expr, not bl.filter_enabled)
-    if wild_is_curse and not bl.filter_enabled:
-        return True, None
+class CompiledBlacklist:
+    """A guild blacklist prepared for matching: its template and own words combined, the empty lists left out.
+    Instances are immutable and picklable, so one can be shared between threads or sent to worker processes."""
+
+    __slots__ = ("common", "wild", "super", "filter_enabled")
+
+    def __init__(self, parts: Iterable[CompiledWords], filter_enabled: bool):
+        parts = tuple(parts)
+        self.common = tuple(p.common for p in parts if len(p.common) > 0)
+        self.wild = tuple(p.wild for p in parts if len(p.wild) > 0)
+        self.super = tuple(p.super for p in parts if len(p.super) > 0)
+        self.filter_enabled = filter_enabled
+
+    def check(self, expr: str, preformatted: bool = False) -> tuple[bool, str | None]:
+        """Returns whether the expression is blacklisted and its censored version if the filter is enabled."""
+        if not preformatted:
+            expr = _format_expression(expr)
+        common_is_curse, expr = _apply_common_blacklist_detection(self.common, expr)
+        if common_is_curse and not self.filter_enabled:
+            return True, None
+
+        wild_is_curse, expr = _apply_wildcard_blacklist_detection(self.wild, expr, not self.filter_enabled)
+        if wild_is_curse and not self.filter_enabled:
+            return True, None
+
+        super_is_curse, expr = _apply_super_blacklist_detection(self.super, expr, not self.filter_enabled)
+
+        return (
+            any([common_is_curse, wild_is_curse, super_is_curse]),
+            expr if self.filter_enabled else None,
+        )
+
+
+def _lru_get(cache: OrderedDict, key: Hashable, factory: Callable[[], Any]) -> Any:
+    value = cache.get(key)
+    if value is not None:
+        cache.move_to_end(key)
+        return value
+
+    value = cache[key] = factory()
+    if len(cache) > AUTOMATON_CACHE_SIZE:
+        cache.popitem(last=False)
+
+    return value
+
+
+# own words of the guilds by their blacklist version and the combined blacklists by
+# (blacklist version, template id, filter enabled), see `BlacklistData.version`
+_compiled_versions: OrderedDict[int, CompiledWords] = OrderedDict()
+_compiled_blacklists: OrderedDict[tuple[int, str | None, bool], CompiledBlacklist] = OrderedDict()
+
+
+def compile_blacklist(bl, filter_enabled: bool | None = None) -> CompiledBlacklist:
+    """Returns the compiled version of the blacklist, `filter_enabled` overrides the one of the blacklist.
+
+    Blacklists with a `version` are looked up by it, so the lookup costs the same however long the lists are.
+    The others are looked up by their contents. The template, if any, is shared and not copied into the result."""
+    if filter_enabled is None:
+        filter_enabled = bl.filter_enabled
+    template_id = getattr(bl, "template", None)
+    template = None if template_id is None else get_template(template_id)
+    version = getattr(bl, "version", None)
+    if version is None:
+        own = _compile_words(tuple(bl.common), tuple(bl.wild), tuple(bl.super))
+        return CompiledBlacklist(filter(None, (template, own)), filter_enabled)
+
+    def build() -> CompiledBlacklist:
+        own = _lru_get(_compiled_versions, version, lambda: CompiledWords(bl.common, bl.wild, bl.super))
+        return CompiledBlacklist(filter(None, (template, own)), filter_enabled)
+
+    return _lru_get(_compiled_blacklists, (version, template_id, filter_enabled), build)
+
+
+def is_blacklisted(bl, expr: str, preformatted: bool = False):
+    return compile_blacklist(bl).check(expr, preformatted)
+
+
+_worker_blacklist: CompiledBlacklist | None = None
+
+
+def _init_worker(compiled: CompiledBlacklist):
+    global _worker_blacklist
+    _worker_blacklist = compiled
+
+
+def _check_in_worker(expr: str) -> tuple[bool, str | None]:
+    return _worker_blacklist.check(expr)
+
+
+def is_blacklisted_many(
+    bl,
+    texts: Iterable[str],
+    censor: bool | None = None,
+    workers: int | None = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+) -> list[tuple[bool, str | None]]:
+    """Checks a batch of texts against one blacklist, the lists are compiled once for the whole batch.
+    Returns `(is_curse, censored)` for every text in order, the censored versions are only built if `censor`
+    (the blacklist filter setting by default) is on. With `workers` the texts are checked in that many processes,
+    which only pays off for batches of many thousands of texts. This function blocks, so async code should run it
+    in an executor."""
+    compiled = compile_blacklist(bl, censor)
+    if workers is None or workers <= 1:
+        return [compiled.check(text) for text in texts]
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(compiled,)) as executor:
+        return list(executor.map(_check_in_worker, texts, chunksize=chunk_size))
+
+
+class BlacklistStream:
+    """Wild and super mode matcher states carried between the messages of one author, so that every message is
+    scanned once and the words split between messages are still found. An automaton state stands for the longest
+    stream suffix that can still grow into a word, so no text has to be kept."""
+
+    __slots__ = ("last_seen", "_wild", "_super", "_wild_states", "_super_states")
+
+    def __init__(self):
+        self.last_seen = time.monotonic()
+        self.reset()
+
+    def reset(self):
+        self._wild: tuple[Automaton, ...] = ()
+        self._super: tuple[Automaton, ...] = ()
+        self._wild_states: list[int] = []
+        self._super_states: list[int] = []
+
+    def feed(self, bl, expr: str) -> bool:
+        """Continues the scan with the next normalized message, returns whether a banned word was completed."""
+        self.last_seen = time.monotonic()
+        compiled = compile_blacklist(bl)
+        if compiled.wild != self._wild:  # the lists were changed, the old states mean nothing now
+            self._wild, self._wild_states = compiled.wild, [0] * len(compiled.wild)
+        if compiled.super != self._super:
+            self._super, self._super_states = compiled.super, [0] * len(compiled.super)
 
-    super_is_curse, expr = _apply_super_blacklist_detection(bl.super, expr, not bl.filter_enabled)
+        is_curse = False
+        # the messages are joined with a space, like in `" ".join(...)`
+        for i, automaton in enumerate(self._wild):
+            spans, self._wild_states[i] = automaton.scan(" " + expr, self._wild_states[i])
+            is_curse = is_curse or len(spans) > 0
+        stripped = expr.replace(" ", "")
+        for i, automaton in enumerate(self._super):
+            spans, self._super_states[i] = automaton.scan(stripped, self._super_states[i])
+            is_curse = is_curse or len(spans) > 0
 
-    return (
-        any([common_is_curse, wild_is_curse, super_is_curse]),
-        expr if bl.filter_enabled else None,
-    )
+        return is_curse
 
 
 def preformat(expr: str, mode: BlacklistMode):
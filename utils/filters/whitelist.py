@@ -1,9 +1,132 @@
-from emoji import demojize
+import re
+from bisect import bisect_right
+from functools import lru_cache
 
+from emoji import EMOJI_DATA, demojize
 
-def contains_fonts(allowed_symbols: str, content: str) -> tuple[bool, list[str]]:
+from utils.constants import WHITELIST_CACHE_SIZE
+
+# every codepoint used in emojis, including the modifiers, joiners and the keycap bases
+EMOJI_CODEPOINTS = frozenset(c for e in EMOJI_DATA for c in e)
+
+# inclusive codepoint intervals of the scripts that can be whitelisted by name, only lowercase letters are included
+# where the script has cases because the messages are lowercased before the check
+SCRIPT_PRESETS: dict[str, tuple[tuple[int, int], ...]] = {
+    "latin": ((0x61, 0x7A), (0xDF, 0xF6), (0xF8, 0x24F), (0x1E00, 0x1EFF)),
+    "cyrillic": ((0x400, 0x52F), (0x1C80, 0x1C8F), (0x2DE0, 0x2DFF), (0xA640, 0xA69F)),
+    "greek": ((0x370, 0x3FF), (0x1F00, 0x1FFF)),
+    "armenian": ((0x531, 0x58F),),
+    "georgian": ((0x10A0, 0x10FF), (0x1C90, 0x1CBF), (0x2D00, 0x2D2F)),
+    "hebrew": ((0x591, 0x5F4),),
+    "arabic": ((0x600, 0x6FF), (0x750, 0x77F), (0x8A0, 0x8FF), (0xFB50, 0xFDFF), (0xFE70, 0xFEFF)),
+    "devanagari": ((0x900, 0x97F), (0xA8E0, 0xA8FF)),
+    "thai": ((0xE00, 0xE7F),),
+    "hangul": ((0x1100, 0x11FF), (0x3130, 0x318F), (0xA960, 0xA97F), (0xAC00, 0xD7FF)),
+    "kana": ((0x3040, 0x30FF), (0x31F0, 0x31FF), (0xFF66, 0xFF9F)),
+    "cjk": (
+        (0x2E80, 0x2FDF),
+        (0x3000, 0x303F),
+        (0x3400, 0x4DBF),
+        (0x4E00, 0x9FFF),
+        (0xF900, 0xFAFF),
+        # only the punctuation of the fullwidth forms, the fullwidth latin letters and digits are what fonts look like
+        (0xFF01, 0xFF0F),
+        (0xFF1A, 0xFF20),
+        (0xFF3B, 0xFF40),
+        (0xFF5B, 0xFF65),
+        (0x20000, 0x3134F),
+    ),
+    "digits": ((0x30, 0x39),),
+    "punctuation": ((0x21, 0x2F), (0x3A, 0x40), (0x5B, 0x60), (0x7B, 0x7E), (0x2010, 0x2027), (0x2030, 0x205E)),
+}
+
+# `U+0400-U+04FF` or a single `U+0401`, the prefix is required so that words like `cafe` are not taken for hex
+CODEPOINT_RANGE_PATTERN = re.compile(r"u\+([0-9a-f]{1,6})(?:\s*-\s*u\+([0-9a-f]{1,6}))?", re.IGNORECASE)
+MAX_CODEPOINT = 0x10FFFF
+
+
+def parse_range(entry: str) -> str | None:
+    """Validates a whitelist range entry and returns its canonical form to be stored, `None` if it is invalid.
+
+    An entry is either a name from `SCRIPT_PRESETS`, an interval of codepoints like `U+0400-U+04FF` or an interval
+    of characters like `а-я`."""
+    entry = entry.strip().lower()
+    if entry in SCRIPT_PRESETS:
+        return entry
+
+    if len(entry) == 3 and entry[1] == "-":
+        start, end = ord(entry[0]), ord(entry[2])
+    elif (match := CODEPOINT_RANGE_PATTERN.fullmatch(entry)) is not None:
+        start = int(match.group(1), 16)
+        end = int(match.group(2), 16) if match.group(2) is not None else start
+    else:
+        return None
+
+    if not 0 <= start <= end <= MAX_CODEPOINT:
+        return None
+    return f"U+{start:04X}-U+{end:04X}"
+
+
+def _intervals(entry: str) -> tuple[tuple[int, int], ...]:
+    if entry in SCRIPT_PRESETS:
+        return SCRIPT_PRESETS[entry]
+
+    start, end = entry.split("-")
+    return ((int(start[2:], 16), int(end[2:], 16)),)
+
+
+class CompiledWhitelist:
+    """The allowed characters with the allowed ranges merged into sorted disjoint intervals.
+
+    A character outside the set is looked up with a bisect over the interval starts, so the cost of a check depends
+    on the amount of intervals rather than on the amount of characters they cover."""
+
+    __slots__ = ("characters", "_starts", "_ends")
+
+    def __init__(self, characters: str, ranges: tuple[str, ...] = ()):
+        self.characters: frozenset[str] = frozenset(characters) | {" "}
+        merged: list[list[int]] = []
+        for start, end in sorted(i for entry in ranges for i in _intervals(entry)):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+
+    def __contains__(self, char: str) -> bool:
+        if char in self.characters:
+            return True
+
+        i = bisect_right(self._starts, ord(char)) - 1
+        return i >= 0 and ord(char) <= self._ends[i]
+
+    def disallowed(self, chars: set[str]) -> set[str]:
+        chars = chars - self.characters
+        if self._starts and chars:
+            chars = {c for c in chars if c not in self}
+
+        return chars
+
+
+@lru_cache(maxsize=WHITELIST_CACHE_SIZE)
+def compile_whitelist(allowed_symbols: str, ranges: tuple[str, ...] = ()) -> CompiledWhitelist:
+    """Returns the compiled whitelist, it is built once per distinct whitelist. The snapshot keeps the same objects
+    until the config changes and strings cache their hash, so a lookup does not depend on their length."""
+    return CompiledWhitelist(allowed_symbols, ranges)
+
+
+def contains_fonts(whitelist: CompiledWhitelist, content: str) -> tuple[bool, list[str]]:
     content = content.strip().replace("\n", "").replace(" ", "").lower()
-    allowed_symbols = set(allowed_symbols)
-    allowed_symbols.add(" ")
-    content = set(demojize(content))
-    return not allowed_symbols >= content, list(content - allowed_symbols)
+    residual = whitelist.disallowed(set(content))
+    if len(residual) == 0:
+        return False, []
+
+    if residual.isdisjoint(EMOJI_CODEPOINTS):
+        return True, list(residual)
+
+    # emojis are checked by their names, e.g. `:thumbs_up:`, so only the emoji part of the message is demojized
+    residual -= EMOJI_CODEPOINTS
+    residual |= whitelist.disallowed(set(demojize("".join(c for c in content if c in EMOJI_CODEPOINTS))))
+    return len(residual) > 0, list(residual)
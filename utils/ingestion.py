@@ -0,0 +1,87 @@
+import asyncio
+from typing import TYPE_CHECKING
+
+from exencolorlogs import FileLogger
+
+from ai.analyser import analyse_sample
+from utils.constants import SAMPLE_BATCH_SIZE, SAMPLE_FLUSH_INTERVAL, SAMPLE_QUEUE_SIZE
+
+if TYPE_CHECKING:
+    from utils.datamodels import Database
+
+SAMPLE_COLUMNS = ["total_chars", "unique_chars", "total_words", "unique_words", "content"]
+
+
+class SampleIngestor:
+    """Write-behind queue for spam samples.
+
+    The moderation path only enqueues the content, a background task collects up to `batch_size` samples
+    (or whatever arrived within `interval` seconds), COPYs them into a temporary staging table and merges it
+    into `data` with a single INSERT ... ON CONFLICT DO NOTHING."""
+
+    def __init__(
+        self,
+        db: "Database",
+        max_size: int = SAMPLE_QUEUE_SIZE,
+        batch_size: int = SAMPLE_BATCH_SIZE,
+        interval: float = SAMPLE_FLUSH_INTERVAL,
+    ):
+        self.log = FileLogger("INGEST")
+        self._db = db
+        self._queue: asyncio.Queue[str] = asyncio.Queue(max_size)
+        self._batch_size = batch_size
+        self._interval = interval
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self):
+        """Waits until all the queued samples are written and stops the background task."""
+        if self._task is None:
+            return
+
+        await self._queue.join()
+        self._task.cancel()
+        self._task = None
+
+    def put(self, content: str) -> bool:
+        try:
+            self._queue.put_nowait(content)
+            return True
+        except asyncio.QueueFull:
+            self.log.warning("Samples queue is full, a sample was dropped")
+            return False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._interval
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+            except Exception as e:
+                self.log.error("Failed to write %s samples: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(self, contents: list[str]):
+        records = [tuple(analyse_sample(content)) for content in contents]
+        async with self._db.acquire() as con, self._db.metrics.track("ingest_samples"):
+            async with con.transaction():
+                await con.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS data_staging (total_chars INT, unique_chars INT, "
+                    "total_words INT, unique_words INT, content TEXT) ON COMMIT DELETE ROWS"
+                )
+                await con.copy_records_to_table("data_staging", records=records, columns=SAMPLE_COLUMNS)
+                await con.execute(
+                    f"INSERT INTO data ({', '.join(SAMPLE_COLUMNS)}) "
+                    f"SELECT {', '.join(SAMPLE_COLUMNS)} FROM data_staging ON CONFLICT DO NOTHING"
+                )
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import uuid
+from typing import TYPE_CHECKING, Any, Callable
+
+import asyncpg
+from exencolorlogs import FileLogger
+
+if TYPE_CHECKING:
+    from utils.datamodels import Database
+
+CHANNEL = "aias_invalidation"
+RECONNECT_DELAY = 5
+
+Handler = Callable[[dict[str, Any]], None]
+
+
+class InvalidationBus:
+    """Propagates cache invalidations between the bot processes sharing one database via Postgres LISTEN/NOTIFY.
+
+    Every notification carries a `kind` (`guild`, `rules`, `autoslowmode`) and the keys identifying the changed entry.
+    A notification without keys means that the whole cache of that kind must be dropped, this is what handlers
+    receive after the listening connection was lost and some notifications could have been missed."""
+
+    def __init__(self, db: "Database"):
+        self.log = FileLogger("BUS")
+        self._db = db
+        self._origin = uuid.uuid4().hex  # changes made by this process are already applied locally
+        self._handlers: dict[str, list[Handler]] = {}
+        self._connection: asyncpg.Connection | None = None
+        self._closing = False
+
+    def subscribe(self, kind: str, handler: Handler):
+        self._handlers.setdefault(kind, []).append(handler)
+
+    async def connect(self):
+        self._connection = await asyncpg.connect(**self._db._connection_config)
+        self._connection.add_termination_listener(self._on_termination)
+        await self._connection.add_listener(CHANNEL, self._on_notification)
+        self.log.ok("Listening for invalidations on %s", CHANNEL)
+
+    async def close(self):
+        self._closing = True
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+
+    async def publish(self, kind: str, **keys):
+        payload = json.dumps({"origin": self._origin, "kind": kind, **keys})
+        await self._db.execute("SELECT pg_notify($1, $2)", CHANNEL, payload, name="notify")
+
+    def _dispatch(self, payload: dict[str, Any]):
+        for handler in self._handlers.get(payload["kind"], []):
+            try:
+                handler(payload)
+            except Exception as e:
+                self.log.error("Invalidation handler for %s failed: %s", payload["kind"], e)
+
+    def _on_notification(self, _connection: asyncpg.Connection, _pid: int, _channel: str, raw_payload: str):
+        payload: dict[str, Any] = json.loads(raw_payload)
+        if payload.pop("origin") == self._origin:
+            return
+
+        self._dispatch(payload)
+
+    def _on_termination(self, _connection: asyncpg.Connection):
+        if self._closing:
+            return
+
+        self.log.warning("Invalidation listener connection was lost, reconnecting...")
+        asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self):
+        while not self._closing:
+            # drop everything, the notifications sent while disconnected are lost
+            for kind in self._handlers:
+                self._dispatch({"kind": kind})
+            try:
+                await self.connect()
+                return
+            except (OSError, asyncpg.PostgresError) as e:
+                self.log.warning("Failed to reconnect invalidation listener: %s", e)
+                await asyncio.sleep(RECONNECT_DELAY)
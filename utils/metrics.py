@@ -0,0 +1,121 @@
+import re
+import time
+from bisect import bisect_left
+from contextlib import asynccontextmanager
+from typing import Any
+
+# upper bounds of the latency histogram buckets in seconds, the last bucket is unbounded
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+QUERY_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+def describe_query(query: str) -> str:
+    """Builds a metrics name for a raw query from its command and first table, e.g. `SELECT guilds`."""
+    words = query.split(maxsplit=1)
+    if len(words) == 0:
+        return "EMPTY"
+
+    match = QUERY_TABLE_PATTERN.search(query)
+    return words[0].upper() if match is None else f"{words[0].upper()} {match.group(1).lower()}"
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> float:
+        """Returns the upper bound of the bucket containing the `q` percentile, the bucket resolution is the limit."""
+        if self.count == 0:
+            return 0.0
+
+        threshold = q * self.count
+        cumulative = 0
+        for bound, amount in zip(LATENCY_BUCKETS, self.counts):
+            cumulative += amount
+            if cumulative >= threshold:
+                return min(bound, self.max)
+
+        return self.max
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "avg": self.total / self.count if self.count > 0 else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": dict(zip((*LATENCY_BUCKETS, float("inf")), self.counts)),
+        }
+
+
+class QueryStats:
+    __slots__ = ("latency", "errors")
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+
+
+class DatabaseMetrics:
+    """Per-query latency histograms, pool acquire wait times, in-flight and error counts of a `Database`."""
+
+    def __init__(self):
+        self.queries: dict[str, QueryStats] = {}
+        self.acquire = Histogram()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started_at = time.time()
+
+    @asynccontextmanager
+    async def track(self, name: str):
+        """Times the block, it is entered along with the pool connection in `async with`."""
+        stats = self.queries.get(name)
+        if stats is None:
+            stats = self.queries[name] = QueryStats()
+
+        self.in_flight += 1
+        if self.in_flight > self.max_in_flight:
+            self.max_in_flight = self.in_flight
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            stats.errors += 1
+            raise
+        finally:
+            stats.latency.observe(time.perf_counter() - started)
+            self.in_flight -= 1
+
+    def reset(self):
+        # in_flight is left as is, the queries being executed right now will decrement it
+        self.queries = {}
+        self.acquire = Histogram()
+        self.max_in_flight = self.in_flight
+        self.started_at = time.time()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "uptime": time.time() - self.started_at,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "acquire": self.acquire.snapshot(),
+            "queries": {
+                name: {**stats.latency.snapshot(), "errors": stats.errors}
+                for name, stats in sorted(self.queries.items(), key=lambda i: i[1].latency.total, reverse=True)
+            },
+        }
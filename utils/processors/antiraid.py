@@ -4,6 +4,7 @@ from random import randint
 import disnake
 
 from utils.bot import Bot
+from utils.datamodels import GuildSnapshot
 from utils.embeds import WarningEmbed
 from utils.enums import AntiraidPunishment
 from utils.utils import Queue, try_send
@@ -37,9 +38,8 @@ class AntiraidProcessor:
             queue.add(member)
             return queue
 
-    async def process(self, member: disnake.Member) -> int:
-        guild_data = self.bot.db.get_guild(member.guild.id)
-        antiraid = await guild_data.get_antiraid_data()
+    async def process(self, member: disnake.Member, snapshot: GuildSnapshot) -> int:
+        antiraid = snapshot.antiraid
         if not antiraid.enabled:
             return 0
 
@@ -51,7 +51,7 @@ class AntiraidProcessor:
             len(queue) >= antiraid.members_limit
             and (queue.getright().joined_at - queue.getleft().joined_at).seconds < antiraid.join_interval
         ):
-            log = await guild_data.get_logger(self.bot)
+            log = await self.bot.db.get_guild(member.guild.id).get_logger(self.bot, snapshot)
             if antiraid.invite_pause_duration is not None:
                 await self.bot.db.execute(
                     """INSERT INTO
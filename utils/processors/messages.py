@@ -1,15 +1,17 @@
+import time
 from logging import DEBUG
 from typing import Literal
 
 import disnake
 from exencolorlogs import FileLogger
 
-from ai.predictor import is_spam
+from ai.predictor import is_spam_async
 from utils.bot import Bot
-from utils.constants import MAX_SPAM_QUEUE_SIZE
+from utils.constants import BLACKLIST_STREAM_TTL, MAX_SPAM_QUEUE_SIZE
+from utils.datamodels import GuildSnapshot
 from utils.embeds import WarningEmbed
-from utils.filters.blacklist import is_blacklisted
-from utils.filters.whitelist import contains_fonts
+from utils.filters.blacklist import BlacklistStream, is_blacklisted, normalization_cache
+from utils.filters.whitelist import compile_whitelist, contains_fonts
 from utils.utils import Queue, delete_and_preserve
 
 
@@ -49,20 +51,20 @@ class MessageQueueProcessor:
         except (KeyError, ValueError):
             return False
 
-    async def process(self, message: disnake.Message) -> bool:
+    async def process(self, message: disnake.Message, snapshot: GuildSnapshot) -> bool:
         pass
 
 
 class AntiSpamQueueProcessor(MessageQueueProcessor):
-    async def process(self, message: disnake.Message) -> bool:
+    async def process(self, message: disnake.Message, snapshot: GuildSnapshot) -> bool:
         queue = self.add(message)
         if queue is False:
             return False
 
         full_content = " ".join([m.content for m in queue])
         self.log.debug(f'Processing message sequence ({len(queue)}: """\n{full_content}\n"""')
-        if is_spam(full_content):
-            warnings = await self.bot.warnings.add_warning(message)
+        if await is_spam_async(full_content):
+            warnings = await self.bot.warnings.add_warning(message, snapshot)
             if warnings != -1:
                 await message.channel.send(
                     f"**{message.author.mention} stop spamming!**",
@@ -74,7 +76,7 @@ This member will be muted in **{warnings} warnings.**",
                     ),
                     delete_after=5,
                 )
-            log = await self.bot.db.get_guild(message.guild.id).get_logger(self.bot)
+            log = await self.bot.db.get_guild(message.guild.id).get_logger(self.bot, snapshot)
             await log.log_queue_deletion(message.author, message.channel, queue)
             await message.channel.delete_messages(queue)
             queue.clear()
@@ -95,9 +97,8 @@ class AntiSpamProcessor:
         self.queue_processor = AntiSpamQueueProcessor(bot)
         self.log = FileLogger("PROC", level=DEBUG)
 
-    async def process(self, message: disnake.Message) -> bool:
-        guild_data = self.bot.db.get_guild(message.guild.id)
-        antispam = await guild_data.get_antispam_data()
+    async def process(self, message: disnake.Message, snapshot: GuildSnapshot) -> bool:
+        antispam = snapshot.antispam
         if (
             not antispam.enabled
             or message.channel.id in antispam.ignored
@@ -106,9 +107,9 @@ class AntiSpamProcessor:
             return False
 
         self.log.debug(f'Processing message: """\n{message.content}\n"""')
-        if is_spam(message.content):
+        if await is_spam_async(message.content):
             await delete_and_preserve(message)
-            warnings = await self.bot.warnings.add_warning(message)
+            warnings = await self.bot.warnings.add_warning(message, snapshot)
             if warnings != -1:
                 await message.channel.send(
                     f"**{message.author.mention}, stop spamming!**",
@@ -120,47 +121,85 @@ This member will be muted in **{warnings} warnings.**",
                     ),
                     delete_after=5,
                 )
-            log = await guild_data.get_logger(self.bot)
+            log = await self.bot.db.get_guild(message.guild.id).get_logger(self.bot, snapshot)
             await log.log_antispam(message.author, message.channel, message.content)
             await self.bot.db.register_message(message.content)
             self.log.debug("Message considered a spam")
             return True
         else:
             self.log.debug("Message considered safe, processing queue")
-            return await self.queue_processor.process(message)
+            return await self.queue_processor.process(message, snapshot)
 
 
 class BlacklistQueueProcessor(MessageQueueProcessor):
-    async def process(self, message: disnake.Message) -> bool:
+    streams: dict[tuple[int, int], BlacklistStream]
+
+    def __init__(self, bot: Bot):
+        super().__init__(bot)
+        self.streams = {}
+        self._last_cleanup = time.monotonic()
+
+    def _cleanup_streams(self):
+        now = time.monotonic()
+        if now - self._last_cleanup < BLACKLIST_STREAM_TTL:
+            return
+
+        self._last_cleanup = now
+        for key, stream in list(self.streams.items()):
+            if now - stream.last_seen > BLACKLIST_STREAM_TTL:
+                del self.streams[key]
+                self.data.get(key[0], {}).pop(key[1], None)
+
+    def _get_stream(self, message: disnake.Message) -> BlacklistStream:
+        key = (message.guild.id, message.author.id)
+        stream = self.streams.get(key)
+        if stream is None or time.monotonic() - stream.last_seen > BLACKLIST_STREAM_TTL:
+            # the words are not searched between the messages separated by a long pause
+            self.data.get(message.guild.id, {}).pop(message.author.id, None)
+            stream = self.streams[key] = BlacklistStream()
+
+        return stream
+
+    async def process(self, message: disnake.Message, snapshot: GuildSnapshot) -> bool:
+        self._cleanup_streams()
+        stream = self._get_stream(message)
+        previous = self.data.get(message.guild.id, {}).get(message.author.id)
+        edited = previous is not None and any(m.id == message.id for m in previous)
         queue = self.add(message)
-        if queue is False:
+        if not edited:
+            is_curse = stream.feed(
+                snapshot.blacklist, normalization_cache.get((message.id, message.content), message.content)
+            )
+        else:
+            # the edited message is somewhere in the middle of the stream, so the sequence is rescanned as a whole
+            messages = [message] if queue is False else queue
+            normalized = [normalization_cache.get((m.id, m.content), m.content) for m in messages]
+            is_curse = is_blacklisted(snapshot.blacklist, " ".join(normalized), preformatted=True)[0]
+            stream.reset()
+            for expr in normalized:
+                stream.feed(snapshot.blacklist, expr)
+
+        if queue is False or not is_curse:
             return False
 
-        full_content = " ".join([m.content for m in queue])
-        guild_data = self.bot.db.get_guild(message.guild.id)
-        if is_blacklisted(
-            await guild_data.get_blacklist_data(),
-            full_content,
-        )[0]:
-            warnings = await self.bot.warnings.add_warning(message)
-            if warnings != -1:
-                await message.channel.send(
-                    f"**{message.author.mention} do not curse!**",
-                    embed=WarningEmbed(
-                        message,
-                        title="Blacklisted Expression Blocked",
-                        description=f"A sequence of messages ({len(queue)}) sent by {message.author.mention} was deleted.\n\
+        warnings = await self.bot.warnings.add_warning(message, snapshot)
+        if warnings != -1:
+            await message.channel.send(
+                f"**{message.author.mention} do not curse!**",
+                embed=WarningEmbed(
+                    message,
+                    title="Blacklisted Expression Blocked",
+                    description=f"A sequence of messages ({len(queue)}) sent by {message.author.mention} was deleted.\n\
 This member will be muted in **{warnings} warnings.**",
-                    ),
-                    delete_after=5,
-                )
-            log = await guild_data.get_logger(self.bot)
-            await log.log_queue_deletion(message.author, message.channel, queue)
-            await message.channel.delete_messages(queue)
-            queue.clear()
-            return True
-
-        return False
+                ),
+                delete_after=5,
+            )
+        log = await self.bot.db.get_guild(message.guild.id).get_logger(self.bot, snapshot)
+        await log.log_queue_deletion(message.author, message.channel, queue)
+        await message.channel.delete_messages(queue)
+        queue.clear()
+        stream.reset()
+        return True
 
 
 class BlacklistProcessor:
@@ -171,9 +210,8 @@ class BlacklistProcessor:
         self.bot = bot
         self.queue_processor = BlacklistQueueProcessor(bot)
 
-    async def process(self, message: disnake.Message):
-        guild = self.bot.db.get_guild(message.guild.id)
-        blacklist = await guild.get_blacklist_data()
+    async def process(self, message: disnake.Message, snapshot: GuildSnapshot):
+        blacklist = snapshot.blacklist
         if (
             not blacklist.enabled
             or message.channel.id in blacklist.ignored
@@ -181,11 +219,12 @@ class BlacklistProcessor:
         ):
             return False
 
-        is_curse, expr = is_blacklisted(blacklist, message.content)
+        normalized = normalization_cache.get((message.id, message.content), message.content)
+        is_curse, expr = is_blacklisted(blacklist, normalized, preformatted=True)
 
         if is_curse:
             await delete_and_preserve(message)
-            warnings = await self.bot.warnings.add_warning(message)
+            warnings = await self.bot.warnings.add_warning(message, snapshot)
             if warnings != -1:
                 embed = WarningEmbed(
                     message,
@@ -202,11 +241,11 @@ This member will be muted in **{warnings} warnings.**",
                     embed=embed,
                     delete_after=5,
                 )
-            log = await guild.get_logger(self.bot)
+            log = await self.bot.db.get_guild(message.guild.id).get_logger(self.bot, snapshot)
             await log.log_blacklist_deletion(message.author, message.channel, message.content, expr)
             return True
         else:
-            return await self.queue_processor.process(message)
+            return await self.queue_processor.process(message, snapshot)
 
 
 class WhitelistProcessor:
@@ -215,13 +254,12 @@ class WhitelistProcessor:
     def __init__(self, bot: Bot):
         self.bot = bot
 
-    async def process(self, message: disnake.Message) -> bool:
-        guild_data = self.bot.db.get_guild(message.guild.id)
-        data = await guild_data.get_whitelist_data()
+    async def process(self, message: disnake.Message, snapshot: GuildSnapshot) -> bool:
+        data = snapshot.whitelist
         if not data.enabled or message.channel.id in data.ignored or any(r.id in data.ignored for r in message.author.roles):
             return False
 
-        is_fonted, chars = contains_fonts(data.characters, message.content)
+        is_fonted, chars = contains_fonts(compile_whitelist(data.characters, data.ranges), message.content)
 
         if is_fonted:
             await delete_and_preserve(message)
@@ -237,7 +275,7 @@ class WhitelistProcessor:
                 ),
                 delete_after=5,
             )
-            log = await guild_data.get_logger(self.bot)
+            log = await self.bot.db.get_guild(message.guild.id).get_logger(self.bot, snapshot)
             await log.log_single_deletion(message.author, message.channel, message.content)
             return True
 
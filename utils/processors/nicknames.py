@@ -0,0 +1,133 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import disnake
+
+from utils.bot import Bot
+from utils.constants import NICKFILTER_SWEEP_CHUNK_SIZE, NICKFILTER_SWEEP_PROGRESS_INTERVAL
+from utils.datamodels import GuildSnapshot
+from utils.enums import Stat
+from utils.filters.blacklist import is_blacklisted, is_blacklisted_many
+from utils.nicknames import generate_random_nick
+from utils.utils import try_send
+
+
+class SweepProgress:
+    __slots__ = ("total", "checked", "flagged", "renamed", "failed")
+
+    def __init__(self, total: int):
+        self.total = total
+        self.checked = 0
+        self.flagged = 0
+        self.renamed = 0
+        self.failed = 0
+
+
+class NickfilterProcessor:
+    bot: Bot
+    sweeping: set[int]
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.sweeping = set()
+
+    async def rename(self, member: disnake.Member, snapshot: GuildSnapshot, notify: bool = True) -> bool:
+        old_nick = member.display_name
+        nick = generate_random_nick()
+        try:
+            await member.edit(nick=nick)
+        except disnake.Forbidden:
+            self.bot.log.warning(
+                "Failed to change nickname of user %s in guild %s",
+                member,
+                member.guild,
+            )
+            return False
+        if notify:
+            await try_send(
+                member,
+                f"Your current name on **{member.guild.name}** does not pass its blacklist filter, \
+so you were given randomly generated **{nick}** nickname.",
+            )
+        log = await self.bot.db.get_guild(member.guild.id).get_logger(self.bot, snapshot)
+        await log.log_nick_change(member, old_nick, nick)
+        await self.bot.db.register_stat_increase(Stat.NICKNAMES_FILTERED)
+        return True
+
+    async def process(self, member: disnake.Member, snapshot: GuildSnapshot):
+        enabled, ignored = snapshot.nickfilter
+        if not enabled or any(r.id in ignored for r in member.roles):
+            return
+
+        if is_blacklisted(snapshot.blacklist, member.display_name)[0]:
+            await self.rename(member, snapshot)
+
+    async def sweep(
+        self,
+        guild: disnake.Guild,
+        snapshot: GuildSnapshot,
+        on_progress: Callable[[SweepProgress], Awaitable[None]],
+    ) -> SweepProgress:
+        """Checks the display names of all the guild members and renames the blacklisted ones.
+
+        The names are checked in chunks with a yield to the event loop after every chunk. The renames are done one
+        by one by a separate task, so that the checking is not held back by them and the requests never burst.
+        `on_progress` is awaited at most every `NICKFILTER_SWEEP_PROGRESS_INTERVAL` seconds and once in the end."""
+        _, ignored = snapshot.nickfilter
+        top_role = guild.me.top_role
+        members = list(guild.members)
+        progress = SweepProgress(len(members))
+        renames: asyncio.Queue[disnake.Member | None] = asyncio.Queue()
+        renamer = asyncio.create_task(self._renamer(renames, snapshot, progress))
+        last_report = time.monotonic()
+        try:
+            for i in range(0, len(members), NICKFILTER_SWEEP_CHUNK_SIZE):
+                chunk = members[i : i + NICKFILTER_SWEEP_CHUNK_SIZE]
+                candidates = [
+                    member
+                    for member in chunk
+                    # the owner and the members above the bot cannot be renamed by it anyway
+                    if member.id != guild.owner_id
+                    and member.top_role < top_role
+                    and not any(r.id in ignored for r in member.roles)
+                ]
+                # the lists are compiled once per blacklist version, so checking chunk by chunk costs nothing extra
+                results = is_blacklisted_many(snapshot.blacklist, [m.display_name for m in candidates], censor=False)
+                for member, (is_curse, _) in zip(candidates, results):
+                    if is_curse:
+                        progress.flagged += 1
+                        renames.put_nowait(member)
+                progress.checked += len(chunk)
+
+                if time.monotonic() - last_report >= NICKFILTER_SWEEP_PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    await on_progress(progress)
+                await asyncio.sleep(0)
+
+            renames.put_nowait(None)
+            while not renamer.done():
+                await asyncio.wait([renamer], timeout=NICKFILTER_SWEEP_PROGRESS_INTERVAL)
+                await on_progress(progress)
+            await renamer
+        finally:
+            renamer.cancel()
+
+        return progress
+
+    async def _renamer(
+        self,
+        renames: asyncio.Queue[disnake.Member | None],
+        snapshot: GuildSnapshot,
+        progress: SweepProgress,
+    ):
+        while (member := await renames.get()) is not None:
+            try:
+                # disnake waits out the rate limits, one request at a time keeps them from being hit at all
+                if await self.rename(member, snapshot, notify=False):
+                    progress.renamed += 1
+                else:
+                    progress.failed += 1
+            except disnake.HTTPException as e:
+                self.bot.log.warning("Failed to rename %s during a sweep in guild %s: %s", member, member.guild, e)
+                progress.failed += 1